@@ -355,6 +355,7 @@ const Admin = () => {
       ProductImage: null,
       GalleryImages: [],
       Qty: product.ProductQuantity || 0,
+      LoadedQty: product.ProductQuantity || 0,
       ProductPrice: product.ProductPrice || 0,
       category: product.category || '',
       is_trending: product.is_trending || false,
@@ -374,7 +375,8 @@ const Admin = () => {
     formData.append('ProductName', State.ProductName);
     formData.append('Description', State.Description);
     if (State.ProductImage) formData.append('ProductImage', State.ProductImage);
-    formData.append('Qty', State.Qty);
+    // Only send stock the admin changed, so an edit never resets stock sold meanwhile
+    if (!isEditing || String(State.Qty) !== String(State.LoadedQty)) formData.append('Qty', State.Qty);
     formData.append('Rate', State.ProductPrice);
     formData.append('category', State.category);
     formData.append('is_trending', State.is_trending);
@@ -4,12 +4,17 @@ from rest_framework.response import Response
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from core.authentication import CachedJWTAuthentication, user_cache
+from core.instrumentation import endpoint_stats
 from rest_framework.permissions import IsAuthenticated
+from core.permissions import IsOwner, add_permission_claims, PERMISSION_FLAGS
 from .serializers import UserSerializer
 
 def get_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
+    # Role and permission flags ride along as claims so staff endpoints can
+    # authorize without loading the profile (see core.permissions).
+    refresh = add_permission_claims(RefreshToken.for_user(user), user.profile)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
@@ -49,14 +54,14 @@ def login_user(request):
         }, status=status.HTTP_200_OK)
     return Response({'Status': 6001, 'message': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 @api_view(['GET'])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def get_user_profile(request):
     serializer = UserSerializer(request.user)
     return Response({'Status': 6000, 'data': serializer.data}, status=status.HTTP_200_OK)
 
 @api_view(['POST', 'PUT'])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def update_user_profile(request):
     serializer = UserSerializer(request.user, data=request.data, partial=True)
@@ -66,30 +71,56 @@ def update_user_profile(request):
     return Response({'Status': 6001, 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, IsOwner])
 def list_employees(request):
-    if request.user.profile.role != 'OWNER':
-        return Response({'Status': 6001, 'message': 'Owner only'}, status=status.HTTP_403_FORBIDDEN)
     employees = User.objects.filter(profile__role='EMPLOYEE')
     serializer = UserSerializer(employees, many=True)
     return Response({'Status': 6000, 'data': serializer.data})
 
 @api_view(['POST'])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, IsOwner])
 def update_employee_permissions(request, pk):
-    if request.user.profile.role != 'OWNER':
-        return Response({'Status': 6001, 'message': 'Owner only'}, status=status.HTTP_403_FORBIDDEN)
     try:
         user = User.objects.get(pk=pk)
         profile = user.profile
         data = request.data
-        profile.can_view_stats = data.get('can_view_stats', profile.can_view_stats)
-        profile.can_manage_products = data.get('can_manage_products', profile.can_manage_products)
-        profile.can_manage_categories = data.get('can_manage_categories', profile.can_manage_categories)
-        profile.can_manage_orders = data.get('can_manage_orders', profile.can_manage_orders)
+        for flag in PERMISSION_FLAGS:
+            if flag in data:
+                setattr(profile, flag, str(data.get(flag)).lower() == 'true')
+        # Saving bumps the profile's permissions version, which retires the
+        # claims in this user's already-issued tokens (store.signals)
         profile.save()
         return Response({'Status': 6000, 'message': 'Permissions updated'})
     except User.DoesNotExist:
         return Response({'Status': 6001, 'message': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
+
+@api_view(['POST'])
+def refresh_tokens(request):
+    # Re-issue both tokens with the user's current role and permissions
+    token = request.data.get('refresh')
+    try:
+        if not token:
+            raise TokenError('Refresh token required')
+        # Rejects blacklisted tokens as well
+        refresh = RefreshToken(token)
+        user = User.objects.select_related('profile').get(pk=refresh['user_id'], is_active=True)
+        # Each refresh token is good for one exchange, so one issued with old
+        # permissions can't be replayed
+        refresh.blacklist()
+    except (TokenError, KeyError, User.DoesNotExist):
+        return Response({'Status': 6001, 'message': 'Invalid refresh token'}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response({'Status': 6000, 'tokens': get_tokens_for_user(user)}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, IsOwner])
+def auth_cache_stats(request):
+    return Response({'Status': 6000, 'data': user_cache.stats()}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, IsOwner])
+def request_metrics(request):
+    return Response({'Status': 6000, 'data': endpoint_stats.summary()}, status=status.HTTP_200_OK)
@@ -0,0 +1,112 @@
+import functools
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotAuthenticated
+from core.async_api import APIResponse, async_api_view, error_response
+from core.events import encode_event, get_broker
+from core.permissions import CanManageOrders
+from store.events import ORDERS, STOCK, user_orders
+
+TOPICS = ('orders', 'stock')
+# Browsers wait this long before reconnecting a dropped stream
+RETRY_MS = 3000
+MAX_PRODUCTS = 100
+
+
+async def can_manage_orders(request):
+    # The claims are in the token; older tokens, and tokens issued before a
+    # permission change, load the profile. Not the answer cached on the
+    # request, so a re-check sees revocations.
+    if hasattr(request, '_store_permissions'):
+        del request._store_permissions
+    return await sync_to_async(CanManageOrders().has_permission)(request, None)
+
+
+async def event_stream(subscription, products, still_allowed=None):
+    # Streams end after EVENT_STREAM_MAX_AGE and the client reconnects with
+    # Last-Event-ID; under Django 4.2 a disconnect is otherwise not noticed.
+    # still_allowed() is awaited between events or keepalives once
+    # EVENT_PERMISSION_RECHECK seconds have passed, and ends the stream once
+    # it returns False.
+    deadline = time.monotonic() + settings.EVENT_STREAM_MAX_AGE
+    next_check = time.monotonic() + settings.EVENT_PERMISSION_RECHECK
+    try:
+        yield f'retry: {RETRY_MS}\n\n'.encode()
+        while True:
+            now = time.monotonic()
+            remaining = deadline - now
+            if remaining <= 0:
+                break
+            if still_allowed is not None and now >= next_check:
+                if not await still_allowed():
+                    break
+                next_check = now + settings.EVENT_PERMISSION_RECHECK
+            event = await subscription.get(min(settings.EVENT_STREAM_HEARTBEAT, remaining))
+            if event is None:
+                # Keeps proxies from closing an idle connection
+                yield b': keepalive\n\n'
+                continue
+            if products and event['type'] == 'stock':
+                levels = {pk: level for pk, level in event['data']['products'].items() if pk in products}
+                if not levels:
+                    continue
+                event = dict(event, data={'products': levels})
+            yield encode_event(event)
+    finally:
+        subscription.close()
+
+
+@async_api_view(query_token='access_token')
+async def order_events(request):
+    """
+    Server-sent events replacing polling of the order lists and stock:
+    order.created and order.status for the caller's orders (every order for
+    staff who manage orders), and stock levels after checkouts.
+    ?topics=orders,stock picks the streams, ?products=<id>,... narrows the
+    stock events.
+    """
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be tied up for the whole stream
+        return APIResponse(
+            {'Status': 6001, 'message': 'Live updates are only served by the ASGI application'}, status=501
+        )
+
+    default_topics = TOPICS if request.user.is_authenticated else ('stock',)
+    topics = [topic for topic in request.GET.get('topics', '').split(',') if topic] or default_topics
+    unknown = set(topics) - set(TOPICS)
+    if unknown:
+        return APIResponse({'Status': 6001, 'message': f'Unknown topics: {", ".join(sorted(unknown))}'}, status=400)
+    try:
+        products = {str(uuid.UUID(pk)) for pk in request.GET.get('products', '').split(',') if pk}
+    except ValueError:
+        return APIResponse({'Status': 6001, 'message': 'Invalid product id'}, status=400)
+    if len(products) > MAX_PRODUCTS:
+        return APIResponse({'Status': 6001, 'message': f'At most {MAX_PRODUCTS} products'}, status=400)
+
+    channels = set()
+    still_allowed = None
+    if 'orders' in topics:
+        if not request.user.is_authenticated:
+            return error_response(NotAuthenticated())
+        staff = await can_manage_orders(request)
+        channels.add(ORDERS if staff else user_orders(request.user.pk))
+        if staff:
+            # A revoked manager's stream ends; the reconnect gets their own orders
+            still_allowed = functools.partial(can_manage_orders, request)
+    if 'stock' in topics:
+        channels.add(STOCK)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    subscription = get_broker().subscribe(channels, last_event_id)
+    response = StreamingHttpResponse(
+        event_stream(subscription, products, still_allowed), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,104 @@
+import uuid
+from collections import OrderedDict
+
+from django.db.models import Case, F, IntegerField, Q, When
+from store.models import Order, OrderItem, Product
+from store.inventory import sharded_product_ids, reserve_stock
+
+
+class InsufficientStock(Exception):
+    def __init__(self, products):
+        self.products = products
+        names = ', '.join(product.ProductName or str(product.pk) for product in products)
+        super().__init__(f'Insufficient stock for {names}')
+
+
+def collect_quantities(items):
+    # product id -> total quantity, merging repeated lines for one product
+    quantities = OrderedDict()
+    for item in items:
+        product_id = str(uuid.UUID(str(item.get('product_id'))))
+        qty = int(item.get('quantity', 1))
+        if qty <= 0:
+            raise ValueError('Quantity must be positive')
+        quantities[product_id] = quantities.get(product_id, 0) + qty
+    return quantities
+
+
+def lock_products(product_ids):
+    """
+    Load the ordered products, row-locking the ones whose stock lives on
+    Product.ProductQuantity. Sharded (hot) products are read without a lock;
+    their stock is reserved from StockSlot rows instead. Returns
+    (products by id, ids of sharded products).
+    """
+    sharded_ids = sharded_product_ids(product_ids)
+    columns = ('id', 'ProductName', 'ProductPrice', 'ProductQuantity', 'category')
+    # Lock in primary key order so concurrent checkouts touching the same
+    # products always acquire row locks in the same order (no deadlocks).
+    locked = Product.objects.select_for_update().filter(
+        id__in=[pk for pk in product_ids if pk not in sharded_ids]
+    ).order_by('id').only(*columns)
+    products = {str(product.pk): product for product in locked}
+    if sharded_ids:
+        products.update(
+            (str(product.pk), product)
+            for product in Product.objects.filter(id__in=sharded_ids).only(*columns)
+        )
+    if len(products) != len(product_ids):
+        raise Product.DoesNotExist
+    return products, sharded_ids
+
+
+def decrement_stock(products, quantities, sharded_ids=()):
+    """
+    Take quantities out of stock. Plain products are decremented with one
+    conditional UPDATE; rows without enough stock are not matched, so a
+    short update count means another checkout won the race and the caller's
+    transaction must roll back. Sharded products reserve from their slots.
+    """
+    plain = OrderedDict((pk, qty) for pk, qty in quantities.items() if pk not in sharded_ids)
+    short = [products[pk] for pk, qty in plain.items() if products[pk].ProductQuantity < qty]
+    if short:
+        raise InsufficientStock(short)
+
+    if plain:
+        enough_stock = Q()
+        for pk, qty in plain.items():
+            enough_stock |= Q(id=pk, ProductQuantity__gte=qty)
+        updated = Product.objects.filter(enough_stock).update(
+            ProductQuantity=Case(
+                *[When(id=pk, then=F('ProductQuantity') - qty) for pk, qty in plain.items()],
+                default=F('ProductQuantity'),
+                output_field=IntegerField(),
+            )
+        )
+        if updated != len(plain):
+            raise InsufficientStock([products[pk] for pk in plain])
+
+    for pk in sorted(sharded_ids):
+        if not reserve_stock(pk, quantities[pk]):
+            raise InsufficientStock([products[pk]])
+
+
+def create_order(user, data, products, quantities):
+    total = sum(float(products[pk].ProductPrice or 0) * qty for pk, qty in quantities.items())
+    order = Order.objects.create(
+        user=user,
+        full_name=data.get('full_name'),
+        address=data.get('address'),
+        city=data.get('city'),
+        zip_code=data.get('zip_code'),
+        total_amount=total,
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=products[pk],
+            quantity=qty,
+            price=float(products[pk].ProductPrice or 0),
+        )
+        for pk, qty in quantities.items()
+    ])
+    return order
+
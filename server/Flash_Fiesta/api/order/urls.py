@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('place/', views.place_order, name='place_order'),
@@ -8,4 +8,5 @@ urlpatterns = [
     path('all/', views.get_all_orders, name='all_orders'),
     path('update-status/<uuid:pk>/', views.update_order_status, name='update_status'),
     path('detail/<uuid:pk>/', views.get_order_detail, name='order_detail'),
+    path('events/', async_views.order_events, name='order_events'),
 ]
@@ -1,11 +1,19 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+from core.instrumentation import timed_serialization
+from core.permissions import CanManageOrders, CanViewStats
 from rest_framework.response import Response
 from store.models import Order, OrderItem, Product
 from .serializers import OrderSerializer
+from .functions import (
+    collect_quantities, lock_products, decrement_stock, create_order, InsufficientStock
+)
 from django.db import transaction
-from django.db.models import Sum
+from store.rollups import record_order_sales, record_status_change
+from store.cache import product_stock_changed
+from store.events import order_created, order_status_changed, stock_changed
+from store.analytics import dashboard_totals, sales_series, category_sales, parse_range, InvalidRange
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -18,48 +26,27 @@ def place_order(request):
         return Response({'Status': 6001, 'message': 'No items in order'}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
+        quantities = collect_quantities(items)
         with transaction.atomic():
-            # Create the order object first
-            order = Order.objects.create(
-                user=user,
-                full_name=data.get('full_name'),
-                address=data.get('address'),
-                city=data.get('city'),
-                zip_code=data.get('zip_code'),
-                total_amount=0 # Placeholder
-            )
+            products, sharded_ids = lock_products(list(quantities))
+            decrement_stock(products, quantities, sharded_ids)
+            order = create_order(user, data, products, quantities)
+            # Queued with the order, so the rollups never miss or double it
+            record_order_sales.enqueue(order_id=str(order.id))
+            # Stock moved through queryset updates, which send no signals
+            transaction.on_commit(lambda: product_stock_changed(*quantities))
+            # Pushed to the order event stream once committed
+            order_created(order)
+            stock_changed(*quantities)
 
-            calculated_total = 0
-            for item in items:
-                product_id = item.get('product_id')
-                product = Product.objects.get(id=product_id)
-                
-                qty = int(item.get('quantity', 1))
-                item_price = float(product.ProductPrice or 0)
-                
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=qty,
-                    price=item_price
-                )
-                
-                # Update stock
-                product.ProductQuantity -= qty
-                product.save()
-                
-                calculated_total += (item_price * qty)
-
-            # Use the calculated total explicitly
-            order.total_amount = calculated_total
-            order.save()
-
-            return Response({
-                'Status': 6000,
-                'message': 'Order placed successfully',
-                'order_id': order.id
-            }, status=status.HTTP_201_CREATED)
+        return Response({
+            'Status': 6000,
+            'message': 'Order placed successfully',
+            'order_id': order.id
+        }, status=status.HTTP_201_CREATED)
             
+    except InsufficientStock as e:
+        return Response({'Status': 6001, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Product.DoesNotExist:
         return Response({'Status': 6001, 'message': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
@@ -68,47 +55,28 @@ def place_order(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_orders(request):
-    orders = Order.objects.filter(user=request.user).prefetch_related('items', 'items__product').order_by('-created_at')
+    # Evaluated first so the serialize timing is serialization alone
+    orders = list(Order.objects.filter(user=request.user).prefetch_related('items', 'items__product').order_by('-created_at'))
     serializer = OrderSerializer(orders, many=True)
+    with timed_serialization(request):
+        data = serializer.data
     return Response({
         'Status': 6000,
-        'data': serializer.data
+        'data': data
     }, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, CanViewStats])
 def get_dashboard_stats(request):
-    profile = request.user.profile
-    if profile.role != 'OWNER' and not profile.can_view_stats:
-        return Response({'Status': 6001, 'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
-        
-    total_orders = Order.objects.count()
-    total_revenue = Order.objects.aggregate(total=Sum('total_amount'))['total'] or 0
-    total_products = Product.objects.count()
-    
-    # Real sales by day for the last 7 days
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    recent_sales = []
-    today = timezone.now().date()
-    for i in range(6, -1, -1):
-        day = today - timedelta(days=i)
-        day_orders = Order.objects.filter(created_at__date=day)
-        revenue = day_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-        sales_count = day_orders.count()
-        recent_sales.append({
-            'name': day.strftime('%a'),
-            'sales': sales_count,
-            'revenue': float(revenue)
-        })
-    
-    stats = {
-        'total_orders': total_orders,
-        'total_revenue': float(total_revenue),
-        'total_products': total_products,
-        'recent_sales': recent_sales
-    }
+    try:
+        range_start, range_end, granularity = parse_range(
+            request.GET.get('start'), request.GET.get('end'), request.GET.get('granularity')
+        )
+        stats = dashboard_totals()
+        stats['recent_sales'] = sales_series(range_start, range_end, granularity)
+        stats['category_sales'] = category_sales(range_start, range_end)
+    except InvalidRange as e:
+        return Response({'Status': 6001, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     return Response({
         'Status': 6000,
@@ -116,41 +84,39 @@ def get_dashboard_stats(request):
     }, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, CanManageOrders])
 def get_all_orders(request):
-    profile = request.user.profile
-    if profile.role != 'OWNER' and not profile.can_manage_orders:
-        return Response({'Status': 6001, 'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
-    orders = Order.objects.all().prefetch_related('items', 'items__product').order_by('-created_at')
+    orders = list(Order.objects.all().prefetch_related('items', 'items__product').order_by('-created_at'))
     serializer = OrderSerializer(orders, many=True)
+    with timed_serialization(request):
+        data = serializer.data
     return Response({
         'Status': 6000,
-        'data': serializer.data
+        'data': data
     }, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, CanManageOrders])
 def update_order_status(request, pk):
-    profile = request.user.profile
-    if profile.role != 'OWNER' and not profile.can_manage_orders:
-        return Response({'Status': 6001, 'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     try:
-        order = Order.objects.get(pk=pk)
         new_status = request.data.get('status')
         if new_status:
-            order.status = new_status
-            order.save()
+            with transaction.atomic():
+                order = Order.objects.select_for_update().get(pk=pk)
+                old_status = order.status
+                order.status = new_status
+                order.save()
+                record_status_change(order, old_status)
+                if order.status != old_status:
+                    order_status_changed(order, old_status)
             return Response({'Status': 6000, 'message': 'Status updated'}, status=status.HTTP_200_OK)
         return Response({'Status': 6001, 'message': 'Status not provided'}, status=status.HTTP_400_BAD_REQUEST)
     except Order.DoesNotExist:
         return Response({'Status': 6001, 'message': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, CanManageOrders])
 def get_order_detail(request, pk):
-    profile = request.user.profile
-    if profile.role != 'OWNER' and not profile.can_manage_orders:
-        return Response({'Status': 6001, 'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     try:
         order = Order.objects.prefetch_related('items', 'items__product').get(pk=pk)
         serializer = OrderSerializer(order)
@@ -0,0 +1,114 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from core.async_api import APIResponse, async_api_view
+from core.instrumentation import timed_serialization
+from core.response_cache import cached_response
+from store.autocomplete import suggestion_index
+from store.cache import product_detail_versions, product_list_versions
+from store.models import Product
+from store.search import search_products
+from .serializers import ProductSerializer
+from .functions import (
+    product_queryset, apaginate_products, aproduct_serializer_context, requested_fields, InvalidCursor,
+    acart_contents
+)
+
+logger = logging.getLogger('flashfiesta.api')
+
+# Async versions of the read-heavy views in views.py, routed instead of them
+# when ASYNC_API is on (ASGI deployments). Same URLs, responses and caching.
+
+@cached_response(product_list_versions)
+@async_api_view()
+async def ProductView(request):
+    try:
+        search_query = request.GET.get('search')
+        category_id = request.GET.get('category')
+        trending = request.GET.get('trending')
+        fields = requested_fields(request)
+
+        products = product_queryset(fields)
+
+        if search_query:
+            # Scores in Python outside Postgres, which reads the database
+            products = await sync_to_async(search_products)(products, search_query)
+        if category_id:
+            products = products.filter(category_id=category_id)
+        if trending == 'true':
+            products = products.filter(is_trending=True)
+        if request.GET.get('min_rating'):
+            products = products.filter(rating_avg__gte=float(request.GET['min_rating']))
+        if request.GET.get('min_reviews'):
+            products = products.filter(review_count__gte=int(request.GET['min_reviews']))
+
+        products, next_cursor = await apaginate_products(
+            products,
+            ordering=request.GET.get('ordering') or ('relevance' if search_query else None),
+            cursor=request.GET.get('cursor'),
+            limit=request.GET.get('limit'),
+        )
+        context = await aproduct_serializer_context(request, products, fields)
+        serializer = ProductSerializer(products, many=True, fields=fields, context=context)
+        with timed_serialization(request):
+            data = serializer.data
+        response_data = {'Status': 6000, 'data': data, 'next_cursor': next_cursor}
+    except InvalidCursor as e:
+        response_data = {'Status': 6001, 'data': [], 'message': str(e)}
+    except Exception:
+        logger.exception('Error fetching product details')
+        response_data = {'Status': 6001, 'data': []}
+
+    return APIResponse(response_data)
+
+@cached_response(product_detail_versions)
+@async_api_view()
+async def ProductDetailView(request, pk):
+    try:
+        fields = requested_fields(request)
+        product = await product_queryset(fields).aget(pk=pk)
+        context = await aproduct_serializer_context(request, [product], fields)
+        serializer = ProductSerializer(product, fields=fields, context=context)
+        with timed_serialization(request):
+            data = serializer.data
+        response_data = {'Status': 6000, 'data': data}
+    except Product.DoesNotExist:
+        response_data = {'Status': 6001, 'message': 'Product not found'}
+    except Exception as e:
+        response_data = {'Status': 6001, 'message': str(e)}
+
+    return APIResponse(response_data)
+
+@async_api_view(authenticated=True)
+async def List_Wishlist(request):
+    try:
+        fields = requested_fields(request)
+        wishlist = [product async for product in product_queryset(fields).filter(wishlisted_by__user=request.user)]
+        context = await aproduct_serializer_context(request, wishlist, fields)
+        serializer = ProductSerializer(wishlist, many=True, fields=fields, context=context)
+        with timed_serialization(request):
+            data = serializer.data
+        return APIResponse({'Status': 6000, 'data': data})
+    except Exception as e:
+        return APIResponse({'Status': 6001, 'data': str(e)}, status=400)
+
+@async_api_view()
+async def Search_Suggestions(request):
+    query = request.GET.get('q', '')
+    if len(query) < 2:
+        return APIResponse({'Status': 6000, 'data': []})
+
+    # In memory; a stale index is rebuilt in the background
+    suggestions = suggestion_index.suggest(query, limit=5)
+
+    return APIResponse({'Status': 6000, 'data': suggestions})
+
+@async_api_view(authenticated=True)
+async def Get_Cart(request):
+    try:
+        items, summary = await acart_contents(request)
+        response = APIResponse({'Status': 6000, 'data': items, 'summary': summary})
+        response['ETag'] = f'"{summary["version"]}"'
+        return response
+    except Exception as e:
+        return APIResponse({'Status': 6001, 'message': str(e)}, status=400)
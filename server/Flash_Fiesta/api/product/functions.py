@@ -0,0 +1,375 @@
+import base64
+import hashlib
+import json
+import uuid
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F, Prefetch, Q
+from store.images import variant_urls
+from store.inventory import stock_expression
+from store.models import Product, Review, OrderItem, UserProfile, CartItem
+from .serializers import ProductSerializer, PRODUCT_PROFILES
+
+MAX_PAGE_SIZE = 200
+
+# ordering name -> (sort expression, descending)
+PRODUCT_ORDERINGS = {
+    'name': (F('ProductName'), False),
+    'price_asc': (F('ProductPrice'), False),
+    'price_desc': (F('ProductPrice'), True),
+    'rating': (F('rating_avg'), True),
+    'reviews': (F('review_count'), True),
+    # Only available on querysets annotated by store.search.search_products
+    'relevance': (F('search_rank'), True),
+}
+DEFAULT_ORDERING = 'name'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Serializer fields that read a column under a different name
+PRODUCT_FIELD_COLUMNS = {
+    'Rate': 'ProductPrice',
+    'Qty': 'ProductQuantity',
+    'category_details': 'category',
+}
+PRODUCT_COMPUTED_FIELDS = {'gallery', 'reviews', 'can_review', 'is_wishlisted'}
+
+
+def requested_fields(request, default=None):
+    """
+    Resolve ?fields= to a list of ProductSerializer field names. Accepts a
+    profile name from PRODUCT_PROFILES or a comma separated list of fields.
+    """
+    value = request.GET.get('fields')
+    if not value:
+        return PRODUCT_PROFILES.get(default)
+    if value in PRODUCT_PROFILES:
+        return PRODUCT_PROFILES[value]
+    known = ProductSerializer.Meta.fields
+    fields = [name for name in value.split(',') if name in known]
+    return fields or PRODUCT_PROFILES.get(default)
+
+
+def product_columns(fields):
+    columns = {'id'}
+    for name in fields:
+        if name in PRODUCT_COMPUTED_FIELDS:
+            continue
+        columns.add(PRODUCT_FIELD_COLUMNS.get(name, name))
+    return columns
+
+
+def product_queryset(fields=None, queryset=None):
+    # One join for the category and one query per nested relation,
+    # independent of how many products end up on the page. With a field
+    # selection only the relations and columns it renders are loaded.
+    if queryset is None:
+        queryset = Product.objects.all()
+    if fields is None or 'category_details' in fields:
+        queryset = queryset.select_related('category')
+    if fields is None or 'gallery' in fields:
+        queryset = queryset.prefetch_related('gallery')
+    if fields is None or 'reviews' in fields:
+        # Only the latest few inline; the rest come from Product_Reviews
+        queryset = queryset.prefetch_related(Prefetch(
+            'reviews',
+            queryset=Review.objects.select_related('user').order_by('-created_at', '-id')[:REVIEW_PREVIEW_SIZE],
+            to_attr='latest_reviews',
+        ))
+    if fields is None or {'ProductQuantity', 'Qty'} & set(fields):
+        queryset = queryset.annotate(stock=stock_expression())
+    if fields is not None:
+        queryset = queryset.only(*product_columns(fields))
+    else:
+        queryset = queryset.defer('search_vector')
+    return queryset
+
+
+def encode_cursor(sort_value, pk):
+    raw = json.dumps([sort_value, str(pk)]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        sort_value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    return sort_value, pk
+
+
+def product_page(queryset, ordering=None, cursor=None, limit=None):
+    # (page queryset, limit); the page holds one row more than the limit
+    if ordering == 'relevance' and 'search_rank' not in queryset.query.annotations:
+        ordering = DEFAULT_ORDERING
+    expression, descending = PRODUCT_ORDERINGS.get(ordering, PRODUCT_ORDERINGS[DEFAULT_ORDERING])
+    queryset = queryset.annotate(sort_key=expression)
+    if descending:
+        queryset = queryset.order_by('-sort_key', '-id')
+    else:
+        queryset = queryset.order_by('sort_key', 'id')
+
+    if cursor:
+        sort_value, pk = decode_cursor(cursor)
+        if descending:
+            after = Q(sort_key__lt=sort_value) | Q(sort_key=sort_value, id__lt=pk)
+        else:
+            after = Q(sort_key__gt=sort_value) | Q(sort_key=sort_value, id__gt=pk)
+        queryset = queryset.filter(after)
+
+    if not limit:
+        return queryset, None
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    # Fetch one extra row to know whether another page exists
+    return queryset[:limit + 1], limit
+
+
+def finish_page(products, limit):
+    next_cursor = None
+    if limit is not None and len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        next_cursor = encode_cursor(last.sort_key, last.pk)
+    return products, next_cursor
+
+
+def paginate_products(queryset, ordering=None, cursor=None, limit=None):
+    """
+    Keyset pagination over (sort key, id). Returns (products, next_cursor);
+    next_cursor is None on the last page or when no limit is given.
+    """
+    page, limit = product_page(queryset, ordering, cursor, limit)
+    return finish_page(list(page), limit)
+
+
+async def apaginate_products(queryset, ordering=None, cursor=None, limit=None):
+    page, limit = product_page(queryset, ordering, cursor, limit)
+    return finish_page([product async for product in page], limit)
+
+
+REVIEW_PAGE_SIZE = 20
+REVIEW_PREVIEW_SIZE = 5
+# ordering name -> (sort columns, descending); id breaks ties
+REVIEW_ORDERINGS = {
+    'newest': (('created_at',), True),
+    'highest': (('rating', 'created_at'), True),
+    'lowest': (('rating', 'created_at'), False),
+}
+DEFAULT_REVIEW_ORDERING = 'newest'
+
+
+def keyset_after(columns, values, pk, descending):
+    # Rows strictly after (values, pk) in (columns, id) order
+    op = 'lt' if descending else 'gt'
+    keys = list(zip(columns, values)) + [('id', pk)]
+    after = Q()
+    for index, (column, value) in enumerate(keys):
+        after |= Q(**dict(keys[:index]), **{f'{column}__{op}': value})
+    return after
+
+
+def paginate_reviews(product_id, ordering=None, cursor=None, limit=None):
+    """
+    Keyset pagination over one product's reviews. Returns
+    (reviews, next_cursor); next_cursor is None on the last page.
+    """
+    columns, descending = REVIEW_ORDERINGS.get(ordering, REVIEW_ORDERINGS[DEFAULT_REVIEW_ORDERING])
+    order = [f'-{column}' if descending else column for column in columns + ('id',)]
+    queryset = Review.objects.filter(product_id=product_id).select_related('user').order_by(*order)
+
+    if cursor:
+        values, pk = decode_cursor(cursor)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise InvalidCursor('Invalid cursor')
+        queryset = queryset.filter(keyset_after(columns, values, pk, descending))
+
+    limit = max(1, min(int(limit or REVIEW_PAGE_SIZE), MAX_PAGE_SIZE))
+    reviews = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(reviews) > limit:
+        reviews = reviews[:limit]
+        last = reviews[-1]
+        values = [getattr(last, column) for column in columns]
+        # Timestamps travel as ISO strings; the filter parses them back
+        next_cursor = encode_cursor([value.isoformat() if hasattr(value, 'isoformat') else value for value in values], last.pk)
+    return reviews, next_cursor
+
+
+def rating_histogram(product_id):
+    histogram = {rating: 0 for rating in range(1, 6)}
+    rows = Review.objects.filter(product_id=product_id).values_list('rating').annotate(n=Count('id')).order_by()
+    for rating, n in rows:
+        histogram[rating] = n
+    return histogram
+
+
+def user_flag_querysets(user, product_ids):
+    # The wishlisted and reviewable product ids, or None when there are none
+    if not user or not user.is_authenticated or not product_ids:
+        return None
+    return (
+        UserProfile.wishlist.through.objects.filter(
+            userprofile__user=user, product_id__in=product_ids
+        ).values_list('product_id', flat=True),
+        OrderItem.objects.filter(
+            order__user=user, order__status='Delivered', product_id__in=product_ids
+        ).values_list('product_id', flat=True).distinct(),
+    )
+
+
+def resolve_user_flags(user, product_ids):
+    """
+    Batch the per-product wishlist and verified-purchase lookups into two
+    queries. The sets are passed to ProductSerializer through its context.
+    """
+    querysets = user_flag_querysets(user, product_ids)
+    if querysets is None:
+        return set(), set()
+    wishlisted, reviewable = querysets
+    return set(wishlisted), set(reviewable)
+
+
+async def aresolve_user_flags(user, product_ids):
+    querysets = user_flag_querysets(user, product_ids)
+    if querysets is None:
+        return set(), set()
+    wishlisted, reviewable = querysets
+    return {pk async for pk in wishlisted}, {pk async for pk in reviewable}
+
+
+def needs_user_flags(fields):
+    return fields is None or bool({'is_wishlisted', 'can_review'} & set(fields))
+
+
+def product_serializer_context(request, products, fields=None):
+    if not needs_user_flags(fields):
+        return {'request': request}
+    wishlisted_ids, reviewable_ids = resolve_user_flags(
+        request.user, [product.pk for product in products]
+    )
+    return {
+        'request': request,
+        'wishlisted_ids': wishlisted_ids,
+        'reviewable_ids': reviewable_ids,
+    }
+
+
+async def aproduct_serializer_context(request, products, fields=None):
+    if not needs_user_flags(fields):
+        return {'request': request}
+    wishlisted_ids, reviewable_ids = await aresolve_user_flags(
+        request.user, [product.pk for product in products]
+    )
+    return {
+        'request': request,
+        'wishlisted_ids': wishlisted_ids,
+        'reviewable_ids': reviewable_ids,
+    }
+
+
+def cart_quantities(items):
+    # product id -> quantity, merging repeated lines and dropping empty ones
+    quantities = {}
+    for item in items:
+        product_id = uuid.UUID(str(item['id']))
+        quantities[product_id] = quantities.get(product_id, 0) + int(item['quantity'])
+    return {product_id: qty for product_id, qty in quantities.items() if qty > 0}
+
+
+def cart_version(quantities):
+    payload = json.dumps(sorted((str(pk), qty) for pk, qty in quantities.items()))
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def stored_cart_version(user):
+    # From the rows themselves, so every process agrees and changes made
+    # outside Sync_Cart (deleted products) are seen
+    return cart_version(dict(CartItem.objects.filter(user=user).values_list('product_id', 'quantity')))
+
+
+def sync_cart(user, quantities):
+    """
+    Bring the user's CartItems in line with quantities using at most one
+    bulk insert, one bulk update and one delete. Unknown product ids are
+    dropped. Returns (version, dropped product ids).
+    """
+    with transaction.atomic():
+        current = {
+            item.product_id: item
+            for item in CartItem.objects.select_for_update().filter(user=user).only('id', 'product', 'quantity')
+        }
+        known = set(Product.objects.filter(id__in=quantities).values_list('id', flat=True))
+        dropped = [pk for pk in quantities if pk not in known]
+        quantities = {pk: qty for pk, qty in quantities.items() if pk in known}
+
+        inserts = [
+            CartItem(user=user, product_id=pk, quantity=qty)
+            for pk, qty in quantities.items() if pk not in current
+        ]
+        updates = []
+        for pk, qty in quantities.items():
+            item = current.get(pk)
+            if item is not None and item.quantity != qty:
+                item.quantity = qty
+                updates.append(item)
+        deletes = [item.pk for pk, item in current.items() if pk not in quantities]
+
+        if inserts:
+            CartItem.objects.bulk_create(inserts)
+        if updates:
+            CartItem.objects.bulk_update(updates, ['quantity'])
+        if deletes:
+            CartItem.objects.filter(pk__in=deletes).delete()
+
+    return cart_version(quantities), dropped
+
+
+def cart_rows(user):
+    # Sharded products' ProductQuantity lags their slots, so read the slots
+    return CartItem.objects.filter(user=user).order_by('added_at').annotate(stock=stock_expression('product__')).values_list(
+        'product_id', 'quantity', 'product__ProductName', 'product__ProductImage',
+        'product__image_variants', 'product__ProductPrice', 'stock',
+    )
+
+
+def cart_contents(request):
+    """
+    The user's cart in the frontend format, read with one joined values()
+    query instead of serializing full products. Line and cart totals are
+    computed here; in_stock flags lines the current stock cannot cover.
+    """
+    return cart_payload(request, cart_rows(request.user))
+
+
+async def acart_contents(request):
+    return cart_payload(request, [row async for row in cart_rows(request.user)])
+
+
+def cart_payload(request, rows):
+    items = []
+    subtotal = 0.0
+    for product_id, qty, name, image, variants, price, stock in rows:
+        line_total = float(price or 0) * qty
+        subtotal += line_total
+        items.append({
+            'id': product_id,
+            'ProductName': name,
+            'ProductImage': request.build_absolute_uri(default_storage.url(image)) if image else None,
+            'image_variants': variant_urls(variants, request),
+            'Rate': price,
+            'quantity': qty,
+            'line_total': line_total,
+            'available': stock,
+            'in_stock': stock >= qty,
+        })
+    summary = {
+        'item_count': sum(item['quantity'] for item in items),
+        'subtotal': subtotal,
+        'all_in_stock': all(item['in_stock'] for item in items),
+        'version': cart_version({item['id']: item['quantity'] for item in items}),
+    }
+    return items, summary
@@ -1,13 +1,31 @@
 from rest_framework import serializers
 from store.models import Product, ProductImageGallery, Category, Review
+from store.images import variant_urls
 from django.contrib.auth.models import User
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    """A store.images manifest as URLs per size and format, with srcset strings."""
+
+    def to_representation(self, value):
+        return variant_urls(value, self.context.get('request'))
+
+class StockField(serializers.ReadOnlyField):
+    """Stock left: the slot total product_queryset annotates, which ProductQuantity lags for sharded products."""
+
+    def __init__(self, **kwargs):
+        super().__init__(source='*', **kwargs)
+
+    def to_representation(self, product):
+        return getattr(product, 'stock', product.ProductQuantity)
+
 class UserBriefSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'first_name', 'last_name']
 
 class CategorySerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Category
         fields = '__all__'
@@ -19,16 +37,33 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'rating', 'comment', 'created_at']
 
 class ProductImageGallerySerializer(serializers.ModelSerializer):
+    variants = ImageVariantsField()
+
     class Meta:
         model = ProductImageGallery
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'variants']
+
+# Named field profiles, selectable with ?fields=<profile> on the product,
+# wishlist and cart endpoints. None means every field.
+PRODUCT_PROFILES = {
+    'card': [
+        'id', 'ProductID', 'ProductName', 'ProductPrice', 'ProductQuantity',
+        'ProductImage', 'image_variants', 'Rate', 'Qty', 'category', 'is_trending',
+        'review_count', 'rating_avg', 'is_wishlisted'
+    ],
+    'cart': ['id', 'ProductName', 'ProductImage', 'image_variants', 'Rate'],
+    'detail': None,
+}
 
 class ProductSerializer(serializers.ModelSerializer):
     gallery = ProductImageGallerySerializer(many=True, read_only=True)
     category_details = CategorySerializer(source='category', read_only=True)
-    reviews = ReviewSerializer(many=True, read_only=True)
+    # Latest few only, prefetched by product_queryset; see Product_Reviews
+    reviews = ReviewSerializer(source='latest_reviews', many=True, read_only=True)
     Rate = serializers.ReadOnlyField(source='ProductPrice')
-    Qty = serializers.ReadOnlyField(source='ProductQuantity')
+    ProductQuantity = StockField()
+    Qty = StockField()
+    image_variants = ImageVariantsField()
     can_review = serializers.SerializerMethodField()
     is_wishlisted = serializers.SerializerMethodField()
 
@@ -36,12 +71,22 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = [
             'id', 'ProductID', 'ProductName', 'ProductDescription', 
-            'ProductPrice', 'ProductQuantity', 'ProductImage', 
+            'ProductPrice', 'ProductQuantity', 'ProductImage', 'image_variants',
             'Rate', 'Qty', 'gallery', 'category', 'category_details', 
-            'is_trending', 'reviews', 'can_review', 'is_wishlisted'
+            'is_trending', 'review_count', 'rating_avg', 'reviews', 'can_review',
+            'is_wishlisted'
         ]
 
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def get_is_wishlisted(self, obj):
+        if 'wishlisted_ids' in self.context:
+            return obj.id in self.context['wishlisted_ids']
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             try:
@@ -51,6 +96,8 @@ class ProductSerializer(serializers.ModelSerializer):
         return False
 
     def get_can_review(self, obj):
+        if 'reviewable_ids' in self.context:
+            return obj.id in self.context['reviewable_ids']
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             from store.models import OrderItem
@@ -64,7 +111,13 @@ class ProductSerializer(serializers.ModelSerializer):
 from store.models import CartItem
 
 class CartItemSerializer(serializers.ModelSerializer):
-    product_details = ProductSerializer(source='product', read_only=True)
+    product_details = ProductSerializer(source='product', read_only=True, fields=PRODUCT_PROFILES['cart'])
     class Meta:
         model = CartItem
-        fields = ['id', 'product', 'product_details', 'quantity']
\ No newline at end of file
+        fields = ['id', 'product', 'product_details', 'quantity']
+
+    def __init__(self, *args, **kwargs):
+        product_fields = kwargs.pop('product_fields', None)
+        super().__init__(*args, **kwargs)
+        if product_fields is not None:
+            self.fields['product_details'] = ProductSerializer(source='product', read_only=True, fields=product_fields)
@@ -1,20 +1,27 @@
+from django.conf import settings
 from django.urls import path
-from Flash_Fiesta.api.product import views
+from Flash_Fiesta.api.product import async_views, views
+
+# Read-heavy endpoints run as async views under ASGI (ASYNC_API)
+read_views = async_views if settings.ASYNC_API else views
 
 urlpatterns = [
-    path('Products/', views.ProductView, name='ProductDetails'),
-    path('Products/<uuid:pk>/', views.ProductDetailView, name='ProductDetail'),
+    path('Products/', read_views.ProductView, name='ProductDetails'),
+    path('Products/<uuid:pk>/', read_views.ProductDetailView, name='ProductDetail'),
+    path('Products/<uuid:pk>/Reviews/', views.Product_Reviews, name='ProductReviews'),
     path('CreateProducts/', views.Create_Product, name='CreateProduct'),
+    path('ImportProducts/', views.Import_Products, name='ImportProducts'),
+    path('ExportProducts/', views.Export_Products, name='ExportProducts'),
     path('Categories/', views.List_Categories, name='ListCategories'),
     path('CreateCategory/', views.Create_Category, name='CreateCategory'),
     path('CreateReview/', views.Create_Review, name='CreateReview'),
-    path('SearchSuggestions/', views.Search_Suggestions, name='SearchSuggestions'),
+    path('SearchSuggestions/', read_views.Search_Suggestions, name='SearchSuggestions'),
     path('Wishlist/Toggle/', views.Toggle_Wishlist, name='ToggleWishlist'),
-    path('Wishlist/', views.List_Wishlist, name='ListWishlist'),
+    path('Wishlist/', read_views.List_Wishlist, name='ListWishlist'),
     path('UpdateProduct/<uuid:pk>/', views.Update_Product, name='UpdateProduct'),
     path('DeleteProduct/<uuid:pk>/', views.Delete_Product, name='DeleteProduct'),
     path('UpdateCategory/<uuid:pk>/', views.Update_Category, name='UpdateCategory'),
     path('DeleteCategory/<uuid:pk>/', views.Delete_Category, name='DeleteCategory'),
     path('Cart/Sync/', views.Sync_Cart, name='SyncCart'),
-    path('Cart/', views.Get_Cart, name='GetCart'),
+    path('Cart/', read_views.Get_Cart, name='GetCart'),
 ]
\ No newline at end of file
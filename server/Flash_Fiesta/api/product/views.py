@@ -1,43 +1,76 @@
+import logging
+
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from core.permissions import CanManageCategories, CanManageProducts, CanViewStats
+from core.authentication import CachedJWTAuthentication
+from core.instrumentation import timed_serialization
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Sum
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from store.models import Product, ProductImageGallery, Category, Review, OrderItem, Order, CartItem
-from .serializers import ProductSerializer, CategorySerializer, ReviewSerializer, CartItemSerializer
+from store.search import search_products
+from store.autocomplete import suggestion_index
+from store.inventory import set_stock
+from store.analytics import dashboard_totals
+from store.images import save_gallery_uploads
+from store.catalog_io import import_products, export_products, format_for, InvalidImport, FORMATS
+from store.cache import category_list_versions, product_detail_versions, product_list_versions
+from core.response_cache import cached_response
+from .serializers import ProductSerializer, CategorySerializer, ReviewSerializer
+from .functions import (
+    product_queryset, paginate_products, product_serializer_context, requested_fields, InvalidCursor,
+    cart_quantities, cart_version, stored_cart_version, sync_cart, cart_contents, paginate_reviews, rating_histogram
+)
+
+logger = logging.getLogger('flashfiesta.api')
 
+@cached_response(product_list_versions)
 @api_view(["GET"])
 def ProductView(request):
     try:
         search_query = request.GET.get('search')
         category_id = request.GET.get('category')
         trending = request.GET.get('trending')
+        fields = requested_fields(request)
         
-        products = Product.objects.all()
+        products = product_queryset(fields)
         
         if search_query:
-            products = products.filter(ProductName__icontains=search_query)
+            products = search_products(products, search_query)
         if category_id:
             products = products.filter(category_id=category_id)
         if trending == 'true':
             products = products.filter(is_trending=True)
-            
-        serializer = ProductSerializer(products, many=True, context={'request': request})
-        response_data = {'Status': 6000, 'data': serializer.data}
-    except Exception as e:
-        print(f"Error fetching product details: {e}")
+        if request.GET.get('min_rating'):
+            products = products.filter(rating_avg__gte=float(request.GET['min_rating']))
+        if request.GET.get('min_reviews'):
+            products = products.filter(review_count__gte=int(request.GET['min_reviews']))
+
+        products, next_cursor = paginate_products(
+            products,
+            ordering=request.GET.get('ordering') or ('relevance' if search_query else None),
+            cursor=request.GET.get('cursor'),
+            limit=request.GET.get('limit'),
+        )
+        context = product_serializer_context(request, products, fields)
+        serializer = ProductSerializer(products, many=True, fields=fields, context=context)
+        with timed_serialization(request):
+            data = serializer.data
+        response_data = {'Status': 6000, 'data': data, 'next_cursor': next_cursor}
+    except InvalidCursor as e:
+        response_data = {'Status': 6001, 'data': [], 'message': str(e)}
+    except Exception:
+        logger.exception('Error fetching product details')
         response_data = {'Status': 6001, 'data': []}
 
     return Response(response_data, status=status.HTTP_200_OK)
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, CanManageProducts])
 def Create_Product(request):
-    profile = request.user.profile
-    if profile.role != 'OWNER' and not profile.can_manage_products:
-        return Response({'Status': 6001, 'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     try:
         ProductName = request.data.get('ProductName')
         Description = request.data.get('Description', '')
@@ -54,19 +87,27 @@ def Create_Product(request):
             id_cat = None
 
         if ProductName:
-            product = Product.objects.create(
-                ProductName=ProductName,
-                ProductDescription=Description,
-                ProductImage=ProductImage,
-                ProductQuantity=Qty,
-                ProductPrice=Rate,
-                category_id=id_cat,
-                is_trending=is_trending
-            )
+            for attempt in range(3):
+                try:
+                    with transaction.atomic():
+                        product = Product.objects.create(
+                            ProductName=ProductName,
+                            ProductDescription=Description,
+                            ProductImage=ProductImage,
+                            ProductQuantity=Qty,
+                            ProductPrice=Rate,
+                            category_id=id_cat,
+                            is_trending=is_trending
+                        )
+                    break
+                except IntegrityError:
+                    # A concurrent create took the same ProductID
+                    if attempt == 2:
+                        raise
             
-            for img in gallery_images:
-                ProductImageGallery.objects.create(product=product, image=img)
-                
+            # Gallery rows and their derivatives are built by a task
+            save_gallery_uploads(product, gallery_images)
+
             return Response({'Status': 6000, 'data': 'Product created successfully'}, status=status.HTTP_201_CREATED)
         else:
             return Response({'Status': 6001, 'data': 'Provide valid data'}, status=status.HTTP_400_BAD_REQUEST)
@@ -74,18 +115,14 @@ def Create_Product(request):
         return Response({'Status': 6001, 'data': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, CanManageProducts])
 def Update_Product(request, pk):
-    profile = request.user.profile
-    if profile.role != 'OWNER' and not profile.can_manage_products:
-        return Response({'Status': 6001, 'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     try:
         product = Product.objects.get(pk=pk)
         data = request.data
         product.ProductName = data.get('ProductName', product.ProductName)
         product.ProductDescription = data.get('Description', product.ProductDescription)
-        product.ProductQuantity = data.get('Qty', product.ProductQuantity)
         product.ProductPrice = data.get('Rate', product.ProductPrice)
         
         category_id = data.get('category')
@@ -97,12 +134,16 @@ def Update_Product(request, pk):
         product.is_trending = str(data.get('is_trending')).lower() == 'true'
         if request.FILES.get('ProductImage'):
             product.ProductImage = request.FILES.get('ProductImage')
-        product.save()
+        # Stock is written by set_stock alone: saving the ProductQuantity
+        # read above would undo checkouts made since
+        product.save(update_fields=[
+            'ProductName', 'ProductDescription', 'ProductPrice', 'category', 'is_trending', 'ProductImage',
+        ])
+        if data.get('Qty') not in (None, ''):
+            set_stock(product.pk, int(data['Qty']))
 
         # Handle Gallery Update
-        gallery_images = request.FILES.getlist('gallery_images')
-        for img in gallery_images:
-            ProductImageGallery.objects.create(product=product, image=img)
+        save_gallery_uploads(product, request.FILES.getlist('gallery_images'))
 
         return Response({'Status': 6000, 'data': 'Product updated successfully'}, status=status.HTTP_200_OK)
     except Product.DoesNotExist:
@@ -111,12 +152,9 @@ def Update_Product(request, pk):
         return Response({'Status': 6001, 'data': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, CanManageProducts])
 def Delete_Product(request, pk):
-    profile = request.user.profile
-    if profile.role != 'OWNER' and not profile.can_manage_products:
-        return Response({'Status': 6001, 'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     try:
         product = Product.objects.get(pk=pk)
         product.delete()
@@ -124,12 +162,17 @@ def Delete_Product(request, pk):
     except Product.DoesNotExist:
         return Response({'Status': 6001, 'message': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
 
+@cached_response(product_detail_versions)
 @api_view(["GET"])
 def ProductDetailView(request, pk):
     try:
-        product = Product.objects.get(pk=pk)
-        serializer = ProductSerializer(product, context={'request': request})
-        response_data = {'Status': 6000, 'data': serializer.data}
+        fields = requested_fields(request)
+        product = product_queryset(fields).get(pk=pk)
+        context = product_serializer_context(request, [product], fields)
+        serializer = ProductSerializer(product, fields=fields, context=context)
+        with timed_serialization(request):
+            data = serializer.data
+        response_data = {'Status': 6000, 'data': data}
     except Product.DoesNotExist:
         response_data = {'Status': 6001, 'message': 'Product not found'}
     except Exception as e:
@@ -137,25 +180,68 @@ def ProductDetailView(request, pk):
 
     return Response(response_data, status=status.HTTP_200_OK)
 
+@cached_response(product_detail_versions)
 @api_view(["GET"])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
+def Product_Reviews(request, pk):
+    try:
+        reviews, next_cursor = paginate_reviews(
+            pk,
+            ordering=request.GET.get('ordering'),
+            cursor=request.GET.get('cursor'),
+            limit=request.GET.get('limit'),
+        )
+        with timed_serialization(request):
+            data = ReviewSerializer(reviews, many=True).data
+        response_data = {'Status': 6000, 'data': data, 'next_cursor': next_cursor}
+        if not request.GET.get('cursor'):
+            summary = Product.objects.filter(pk=pk).values('review_count', 'rating_avg').first()
+            if summary is None:
+                return Response({'Status': 6001, 'message': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+            summary['histogram'] = rating_histogram(pk)
+            response_data['summary'] = summary
+    except Exception as e:
+        response_data = {'Status': 6001, 'data': [], 'message': str(e)}
+
+    return Response(response_data, status=status.HTTP_200_OK)
+
+@api_view(["POST"])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, CanManageProducts])
+def Import_Products(request):
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response({'Status': 6001, 'message': 'Upload a CSV or JSONL file as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        summary = import_products(
+            upload,
+            format=request.data.get('file_format') or format_for(upload.name),
+            create_categories=str(request.data.get('create_categories')).lower() == 'true',
+        )
+    except InvalidImport as e:
+        return Response({'Status': 6001, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'Status': 6000, 'data': summary}, status=status.HTTP_200_OK)
+
+@api_view(["GET"])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, CanManageProducts])
+def Export_Products(request):
+    # Not ?format=, which DRF reserves for picking a renderer
+    export_format = request.GET.get('file_format', 'csv')
+    if export_format not in FORMATS:
+        return Response({'Status': 6001, 'message': 'file_format must be csv or jsonl'}, status=status.HTTP_400_BAD_REQUEST)
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(export_products(export_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="products.{export_format}"'
+    return response
+
+@api_view(["GET"])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, CanViewStats])
 def Dashboard_Stats(request):
-    profile = request.user.profile
-    if profile.role != 'OWNER' and not profile.can_view_stats:
-        return Response({'Status': 6001, 'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
-    
-    total_products = Product.objects.count()
-    total_orders = Order.objects.count()
-    total_revenue = Order.objects.aggregate(total=Sum('total_amount'))['total'] or 0
-    
-    data = {
-        'total_products': total_products,
-        'total_orders': total_orders,
-        'total_revenue': total_revenue
-    }
+    data = dashboard_totals()
     return Response({'Status': 6000, 'data': data})
 
+@cached_response(category_list_versions)
 @api_view(["GET"])
 def List_Categories(request):
     categories = Category.objects.all()
@@ -163,12 +249,9 @@ def List_Categories(request):
     return Response({'Status': 6000, 'data': serializer.data})
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, CanManageCategories])
 def Create_Category(request):
-    profile = request.user.profile
-    if profile.role != 'OWNER' and not profile.can_manage_categories:
-        return Response({'Status': 6001, 'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     try:
         name = request.data.get('name')
         image = request.FILES.get('image')
@@ -180,12 +263,9 @@ def Create_Category(request):
         return Response({'Status': 6001, 'data': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, CanManageCategories])
 def Update_Category(request, pk):
-    profile = request.user.profile
-    if profile.role != 'OWNER' and not profile.can_manage_categories:
-        return Response({'Status': 6001, 'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     try:
         category = Category.objects.get(pk=pk)
         name = request.data.get('name')
@@ -204,12 +284,9 @@ def Update_Category(request, pk):
         return Response({'Status': 6001, 'data': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated, CanManageCategories])
 def Delete_Category(request, pk):
-    profile = request.user.profile
-    if profile.role != 'OWNER' and not profile.can_manage_categories:
-        return Response({'Status': 6001, 'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     try:
         category = Category.objects.get(pk=pk)
         category.delete()
@@ -218,7 +295,7 @@ def Delete_Category(request, pk):
         return Response({'Status': 6001, 'message': 'Category not found'}, status=status.HTTP_404_NOT_FOUND)
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def Create_Review(request):
     try:
@@ -240,6 +317,10 @@ def Create_Review(request):
                     'data': 'Verified Purchase Required: You can only review products that have been delivered to you.'
                 }, status=status.HTTP_403_FORBIDDEN)
 
+            rating = int(rating)
+            if not 1 <= rating <= 5:
+                return Response({'Status': 6001, 'data': 'Rating must be between 1 and 5'}, status=status.HTTP_400_BAD_REQUEST)
+            # The product's rating counters are updated by a post_save signal
             Review.objects.create(
                 product_id=product_id,
                 user=request.user,
@@ -252,7 +333,7 @@ def Create_Review(request):
         return Response({'Status': 6001, 'data': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def Toggle_Wishlist(request):
     try:
@@ -276,13 +357,17 @@ def Toggle_Wishlist(request):
         return Response({'Status': 6001, 'data': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(["GET"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def List_Wishlist(request):
     try:
-        wishlist = request.user.profile.wishlist.all()
-        serializer = ProductSerializer(wishlist, many=True, context={'request': request})
-        return Response({'Status': 6000, 'data': serializer.data}, status=status.HTTP_200_OK)
+        fields = requested_fields(request)
+        wishlist = list(product_queryset(fields).filter(wishlisted_by__user=request.user))
+        context = product_serializer_context(request, wishlist, fields)
+        serializer = ProductSerializer(wishlist, many=True, fields=fields, context=context)
+        with timed_serialization(request):
+            data = serializer.data
+        return Response({'Status': 6000, 'data': data}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({'Status': 6001, 'data': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -292,49 +377,38 @@ def Search_Suggestions(request):
     if len(query) < 2:
         return Response({'Status': 6000, 'data': []})
     
-    suggestions = Product.objects.filter(ProductName__icontains=query).values_list('ProductName', flat=True).distinct()[:5]
+    suggestions = suggestion_index.suggest(query, limit=5)
             
-    return Response({'Status': 6000, 'data': list(suggestions)}, status=status.HTTP_200_OK)
+    return Response({'Status': 6000, 'data': suggestions}, status=status.HTTP_200_OK)
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def Sync_Cart(request):
     try:
-        items = request.data.get('items', [])
-        # Clear existing and replace with new state (simplest for sync)
-        CartItem.objects.filter(user=request.user).delete()
-        
-        for item in items:
-            CartItem.objects.create(
-                user=request.user,
-                product_id=item['id'],
-                quantity=item['quantity']
-            )
-        return Response({'Status': 6000, 'message': 'Cart synced'}, status=status.HTTP_200_OK)
+        quantities = cart_quantities(request.data.get('items', []))
+        version = cart_version(quantities)
+        # Unchanged cart: one read instead of the locking sync
+        if stored_cart_version(request.user) == version:
+            response = Response({'Status': 6000, 'message': 'Cart unchanged', 'version': version}, status=status.HTTP_200_OK)
+        else:
+            version, dropped = sync_cart(request.user, quantities)
+            response = Response({
+                'Status': 6000, 'message': 'Cart synced', 'version': version, 'dropped': dropped
+            }, status=status.HTTP_200_OK)
+        response['ETag'] = f'"{version}"'
+        return response
     except Exception as e:
         return Response({'Status': 6001, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(["GET"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def Get_Cart(request):
     try:
-        cart_items = CartItem.objects.filter(user=request.user)
-        serializer = CartItemSerializer(cart_items, many=True, context={'request': request})
-        
-        # Transform to frontend format
-        formatted_data = []
-        for item in serializer.data:
-            p = item['product_details']
-            formatted_data.append({
-                'id': p['id'],
-                'ProductName': p['ProductName'],
-                'ProductImage': p['ProductImage'],
-                'Rate': p['Rate'],
-                'quantity': item['quantity']
-            })
-            
-        return Response({'Status': 6000, 'data': formatted_data}, status=status.HTTP_200_OK)
+        items, summary = cart_contents(request)
+        response = Response({'Status': 6000, 'data': items, 'summary': summary}, status=status.HTTP_200_OK)
+        response['ETag'] = f'"{summary["version"]}"'
+        return response
     except Exception as e:
-        return Response({'Status': 6001, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response({'Status': 6001, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
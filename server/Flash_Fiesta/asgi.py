@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Flash_Fiesta.settings')
+# Route the catalog and cart reads to their async views (Flash_Fiesta.api.product.async_views)
+os.environ.setdefault('ASYNC_API', 'true')
 
 application = get_asgi_application()
+
+# Build the search suggestions in the background at startup, so the first
+# lookups do not wait on it (needs the apps loaded above)
+from store.autocomplete import suggestion_index  # noqa: E402
+
+suggestion_index.refresh()
@@ -58,11 +58,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'store'
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -151,15 +154,148 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_ROOT = BASE_DIR/'uploads'
 MEDIA_URL = '/MEDIA/'
+# Media responses (core.media). MEDIA_SENDFILE hands the transfer to the
+# front server: 'x-accel-redirect' (nginx, internal location at
+# MEDIA_ACCEL_PREFIX) or 'x-sendfile'. Names under the immutable prefixes
+# are content addressed and cached for a year; other uploads for a day.
+MEDIA_SENDFILE = config('MEDIA_SENDFILE', default='')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_IMMUTABLE_PREFIXES = ('derivatives/',)
+MEDIA_MAX_AGE = 86400
 from datetime import timedelta
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'EXCEPTION_HANDLER': 'core.exceptions.handler.custom_exception_handler',
 }
 
+# In-process cache of authenticated users (core.authentication)
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = 300
+
+# Cached public catalog responses (core.response_cache). The file backend
+# shares entries and invalidation versions between worker processes on one
+# host; point RESPONSE_CACHE_BACKEND/LOCATION at Redis or memcached to share
+# them across hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': config('RESPONSE_CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('RESPONSE_CACHE_LOCATION', default=str(BASE_DIR / '.cache' / 'responses')),
+        'TIMEOUT': 300,
+    },
+}
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = 300
+# Current permission versions (core.permissions), so staff tokens are checked
+# without a query. Must be an in-memory cache every process shares, e.g.
+# redis://host:6379/1. Unset, every staff request reads its profile.
+PERMISSIONS_CACHE_LOCATION = config('PERMISSIONS_CACHE_LOCATION', default='')
+if PERMISSIONS_CACHE_LOCATION:
+    CACHES['permissions'] = {
+        'BACKEND': config('PERMISSIONS_CACHE_BACKEND', default='django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': PERMISSIONS_CACHE_LOCATION,
+    }
+PERMISSIONS_CACHE_ALIAS = 'permissions' if PERMISSIONS_CACHE_LOCATION else None
+
+# Request instrumentation (core.instrumentation). Budgets are per URL name
+# and include one query for a user not yet in the auth cache and, on staff
+# endpoints, one for the profile's permissions (no PERMISSIONS_CACHE_LOCATION);
+# requests over budget are logged, or raise when QUERY_BUDGET_STRICT is on (tests).
+REQUEST_METRICS_HEADER = True
+QUERY_BUDGET_STRICT = False
+QUERY_BUDGETS = {
+    'ProductDetails': 6,
+    'ProductDetail': 6,
+    'ProductReviews': 4,
+    'ListCategories': 1,
+    'SearchSuggestions': 2,
+    'ListWishlist': 6,
+    'GetCart': 2,
+    'SyncCart': 8,
+    'place_order': 14,
+    'user_orders': 4,
+    'all_orders': 5,
+    # Rollups plus the orders no task has counted yet (store.analytics)
+    'dashboard_stats': 8,
+}
+
+# Serve the read-heavy catalog and cart endpoints from async views. On by
+# default under asgi.py (e.g. `uvicorn Flash_Fiesta.asgi:application`),
+# off under WSGI, where async views would each need their own event loop.
+ASYNC_API = config('ASYNC_API', default=False, cast=bool)
+
+# Background tasks (store.tasks), run by `manage.py run_tasks` workers.
+# Deployments must run at least one worker unless TASKS_EAGER is set:
+# without one, queued work never happens, so image derivatives and gallery
+# uploads are never attached and the dashboard aggregates every uncounted
+# order live instead of reading its rollups. The system checks warn
+# (store.W001) when tasks have waited over TASK_WORKER_GRACE and no worker
+# claimed any. TASKS_EAGER runs tasks in the request on commit instead, for
+# setups without a worker. A task still running after TASK_LEASE_TIMEOUT
+# is taken to have lost its worker and is queued again.
+TASKS_EAGER = config('TASKS_EAGER', default=False, cast=bool)
+TASK_WORKER_GRACE = timedelta(minutes=5)
+TASK_LEASE_TIMEOUT = timedelta(minutes=10)
+TASK_RETENTION = timedelta(days=7)
+
+# Server push (core.events, served at api/order/events/ under ASGI). Unset,
+# EVENT_BROKER is PostgresBroker on Postgres, so every server process sees
+# every event, and the in-process LocalBroker otherwise. EVENT_HISTORY events
+# are kept for clients that reconnect with Last-Event-ID. Streams send a
+# comment every EVENT_STREAM_HEARTBEAT seconds and end after
+# EVENT_STREAM_MAX_AGE, when the client reconnects. Streams of every order
+# re-check the user's permission every EVENT_PERMISSION_RECHECK seconds.
+EVENT_BROKER = config('EVENT_BROKER', default=None)
+EVENT_HISTORY = 1000
+EVENT_STREAM_HEARTBEAT = 15
+EVENT_STREAM_MAX_AGE = 300
+EVENT_PERMISSION_RECHECK = 30
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'flashfiesta.requests': {
+            'handlers': ['console'],
+            'level': config('REQUEST_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        'flashfiesta.images': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'flashfiesta.tasks': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'flashfiesta.events': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'flashfiesta.autocomplete': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'flashfiesta.api': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
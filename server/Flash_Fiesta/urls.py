@@ -17,7 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path,include
 from django.conf import settings
-from django.conf.urls.static import static
+from core.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,4 +25,5 @@ urlpatterns = [
     path('api/product/',include("Flash_Fiesta.api.product.urls")),
     path('api/auth/', include("Flash_Fiesta.api.auth.urls")),
     path('api/order/', include("Flash_Fiesta.api.order.urls")),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'),
+]
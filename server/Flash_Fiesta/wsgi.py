@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Flash_Fiesta.settings')
 
 application = get_wsgi_application()
+
+# Build the search suggestions in the background at startup, so the first
+# lookups do not wait on it (needs the apps loaded above)
+from store.autocomplete import suggestion_index  # noqa: E402
+
+suggestion_index.refresh()
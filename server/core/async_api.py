@@ -0,0 +1,52 @@
+import functools
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.utils.encoders import JSONEncoder
+
+from .authentication import CachedJWTAuthentication
+
+# Same bytes as DRF's JSONRenderer with its default settings
+JSON_DUMPS_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+class APIResponse(JsonResponse):
+    """JsonResponse that keeps .data, like DRF's Response (see cached_response)."""
+
+    def __init__(self, data, status=200, **kwargs):
+        super().__init__(
+            data, encoder=JSONEncoder, safe=False, status=status, json_dumps_params=JSON_DUMPS_PARAMS, **kwargs
+        )
+        self.data = data
+
+
+def error_response(exc):
+    data = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+    response = APIResponse(data, status=exc.status_code)
+    response['WWW-Authenticate'] = CachedJWTAuthentication().authenticate_header(None)
+    return response
+
+
+def async_api_view(authenticated=False, query_token=None):
+    """
+    Async counterpart of @api_view(['GET']) for read-only views: JWT
+    authentication through the user cache, 401s shaped like DRF's, and
+    request.user set for the view. authenticated=True is IsAuthenticated;
+    query_token also accepts the token from that query string parameter.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return APIResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            try:
+                result = await CachedJWTAuthentication().aauthenticate(request, query_token)
+            except AuthenticationFailed as exc:
+                return error_response(exc)
+            request.user, request.auth = result if result is not None else (AnonymousUser(), None)
+            if authenticated and not request.user.is_authenticated:
+                return error_response(NotAuthenticated())
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
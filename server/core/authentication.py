@@ -0,0 +1,133 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """
+    Bounded LRU of User rows keyed by id, with a TTL so writes made by other
+    processes (whose signals never reach this one) are picked up.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._users = OrderedDict()  # user id -> (expires at, user)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self._users.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._users.move_to_end(user_id)
+            self.hits += 1
+        # Each request gets its own copy so views can't change the cached row
+        return copy.copy(entry[1])
+
+    def put(self, user):
+        user = copy.copy(user)
+        user._state.fields_cache = {}
+        with self._lock:
+            self._users[user.pk] = (time.monotonic() + self.ttl, user)
+            self._users.move_to_end(user.pk)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._users),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 300),
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user through user_cache,
+    so an authenticated request normally costs no User query.
+    """
+
+    def get_user(self, validated_token):
+        user = self.get_cached_user(validated_token)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.put(user)
+        return user
+
+    async def aauthenticate(self, request, query_param=None):
+        """
+        authenticate() for async views: token checks are CPU only, and only
+        a user missing from the cache goes to the database. query_param
+        names a query string parameter to read the token from when there is
+        no Authorization header (EventSource can't send headers).
+        """
+        header = self.get_header(request)
+        if header is not None:
+            raw_token = self.get_raw_token(header)
+        elif query_param and request.GET.get(query_param):
+            raw_token = request.GET[query_param].encode()
+        else:
+            return None
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        user = self.get_cached_user(validated_token)
+        if user is None:
+            user = await sync_to_async(super().get_user)(validated_token)
+            user_cache.put(user)
+        return user, validated_token
+
+    def get_cached_user(self, validated_token):
+        try:
+            user_id = self.user_model._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            return None
+
+        # Same checks JWTAuthentication runs on a freshly loaded user
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('flashfiesta.events')
+
+# Events a subscriber may have waiting before it is sent a resync instead
+QUEUE_SIZE = 256
+# Event type telling a client it missed events and should refetch
+RESYNC = 'resync'
+
+
+class Subscription:
+    """
+    One stream's queue of events on a set of channels. The broker fills it
+    from any thread; it is read on the event loop that subscribed.
+    """
+
+    def __init__(self, broker, channels, size=QUEUE_SIZE):
+        self.broker = broker
+        self.channels = frozenset(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(size)
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self.put, event)
+        except RuntimeError:
+            # The loop is gone; the stream's own cleanup unsubscribes it
+            pass
+
+    def put(self, event):
+        if self.queue.full():
+            # Too far behind to catch up one event at a time
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = self.broker.resync_event()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """The next event, or None if none arrives within timeout seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    In-process pub/sub. Events only reach subscribers in the publishing
+    process, which is enough for tests and a single server process.
+
+    Event ids are "<epoch>-<sequence>", where the epoch is new each time the
+    process starts. A client that reconnects with the last id it saw gets
+    the events it missed from a short history. If they are no longer there,
+    or the id comes from another process or epoch, it gets a resync event
+    instead. Events carry absolute values (a status, a stock level), so
+    receiving one twice is harmless.
+    """
+
+    def __init__(self, history=None):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._history = deque(maxlen=history or settings.EVENT_HISTORY)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, channel, type, data):
+        self.dispatch(channel, type, data)
+
+    def dispatch(self, channel, type, data):
+        with self._lock:
+            self._sequence += 1
+            event = {'id': f'{self.epoch}-{self._sequence}', 'channel': channel, 'type': type, 'data': data}
+            self._history.append((self._sequence, event))
+            subscribers = [subscription for subscription in self._subscribers if channel in subscription.channels]
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def resync_event(self):
+        return {'id': f'{self.epoch}-{self._sequence}', 'channel': None, 'type': RESYNC, 'data': {}}
+
+    def reset(self):
+        """Forget the history and tell every subscriber to resync, after events may have been lost."""
+        with self._lock:
+            self._history.clear()
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.deliver(self.resync_event())
+
+    def subscribe(self, channels, last_event_id=None):
+        """Call from the event loop the stream runs on."""
+        subscription = Subscription(self, channels)
+        with self._lock:
+            self._subscribers.add(subscription)
+            missed = self.missed_events(subscription.channels, last_event_id)
+        for event in missed:
+            subscription.put(event)
+        return subscription
+
+    def missed_events(self, channels, last_event_id):
+        if not last_event_id:
+            return []
+        epoch, _, sequence = last_event_id.partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return [self.resync_event()]
+        sequence = int(sequence)
+        if sequence >= self._sequence:
+            return []
+        if not self._history or self._history[0][0] > sequence + 1:
+            return [self.resync_event()]
+        return [event for number, event in self._history if number > sequence and event['channel'] in channels]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Shares events between server processes through Postgres NOTIFY. Each
+    process with subscribers LISTENs on a connection of its own and
+    dispatches what arrives to them, so ids and history stay per process.
+    """
+
+    channel = 'flashfiesta_events'
+    # Postgres rejects NOTIFY payloads of 8000 bytes or more
+    max_payload = 7999
+
+    def __init__(self, history=None):
+        super().__init__(history)
+        self._listener = None
+
+    def publish(self, channel, type, data):
+        # Delivered when the surrounding transaction commits
+        payload = json.dumps({'channel': channel, 'type': type, 'data': data}, cls=DjangoJSONEncoder)
+        if len(payload.encode()) > self.max_payload:
+            raise ValueError(f'{type} event is {len(payload.encode())} bytes, over the NOTIFY limit; publish it in parts')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def subscribe(self, channels, last_event_id=None):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self.listen, name='event-listener', daemon=True)
+                self._listener.start()
+        return super().subscribe(channels, last_event_id)
+
+    def listen(self):
+        delay = 1
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = connection.get_new_connection(connection.get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                if connected_before:
+                    # Whatever was published while reconnecting is lost
+                    self.reset()
+                connected_before = True
+                delay = 1
+                while True:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        message = json.loads(conn.notifies.pop(0).payload)
+                        self.dispatch(message['channel'], message['type'], message['data'])
+            except Exception:
+                logger.exception('Event listener lost its connection, reconnecting in %ss', delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The process's broker: EVENT_BROKER, or PostgresBroker on Postgres and LocalBroker elsewhere."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            path = settings.EVENT_BROKER or (
+                'core.events.PostgresBroker' if connection.vendor == 'postgresql' else 'core.events.LocalBroker'
+            )
+            _broker = import_string(path)()
+        return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting in ('EVENT_BROKER', 'EVENT_HISTORY'):
+        with _broker_lock:
+            _broker = None
+
+
+def publish(channel, type, data):
+    """
+    Publish an event now. Callers inside a transaction should defer this
+    with transaction.on_commit so rolled back changes are never announced.
+    A failure is logged rather than failing the request that published.
+    """
+    try:
+        get_broker().publish(channel, type, data)
+    except Exception:
+        logger.exception('Could not publish %s on %s', type, channel)
+
+
+def encode_event(event):
+    """An event as a text/event-stream message."""
+    data = json.dumps(event['data'], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f'id: {event["id"]}\nevent: {event["type"]}\ndata: {data}\n\n'.encode()
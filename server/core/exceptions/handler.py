@@ -1,5 +1,5 @@
 from rest_framework.views import exception_handler
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import ValidationError, PermissionDenied
 from rest_framework.response import Response
 
 
@@ -25,4 +25,14 @@ def custom_exception_handler(exc, context):
             status=response.status_code,
         )
 
+    # Permission classes deny in the same shape the views always used
+    if isinstance(exc, PermissionDenied):
+        return Response(
+            {
+                "Status": 6001,
+                "message": str(exc.detail),
+            },
+            status=response.status_code,
+        )
+
     return response
\ No newline at end of file
@@ -0,0 +1,207 @@
+import json
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('flashfiesta.requests')
+
+# Recent requests kept per URL name for the percentile summary
+SAMPLE_SIZE = 1000
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    """Database execute wrapper counting queries and their wall time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def install_wrappers(stats):
+    # Connections are per thread: call from the thread that will run the queries
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(stats))
+    return stack
+
+
+@contextmanager
+def track_queries(budget=None, label='block'):
+    """
+    Count the queries run inside the block on every database alias. With a
+    budget, raise QueryBudgetExceeded when the block runs more than that:
+
+        with track_queries(budget=5):
+            client.get('/api/product/Products/')
+    """
+    stats = QueryStats()
+    with install_wrappers(stats):
+        yield stats
+    if budget is not None and stats.count > budget:
+        raise QueryBudgetExceeded(f'{label} ran {stats.count} queries, budget is {budget}')
+
+
+@contextmanager
+def timed_serialization(request):
+    """
+    Add the block's time to the request's serialize timing. Wrap
+    serializer.data in views: it runs inside the view, before the
+    response renders, so render time alone misses it.
+    """
+    # DRF's Request wraps the HttpRequest the middleware reads
+    request = getattr(request, '_request', request)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        request._serialize_time = getattr(request, '_serialize_time', 0.0) + time.perf_counter() - start
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class EndpointStats:
+    def __init__(self, sample_size=SAMPLE_SIZE):
+        self._samples = defaultdict(lambda: deque(maxlen=sample_size))  # name -> (ms, queries)
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name, duration_ms, queries):
+        with self._lock:
+            self._samples[name].append((duration_ms, queries))
+            self._counts[name] += 1
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def summary(self):
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+            counts = dict(self._counts)
+        result = {}
+        for name, values in samples.items():
+            durations = [duration for duration, queries in values]
+            queries = [queries for duration, queries in values]
+            result[name] = {
+                'requests': counts[name],
+                'p50_ms': round(percentile(durations, 50), 2),
+                'p95_ms': round(percentile(durations, 95), 2),
+                'p99_ms': round(percentile(durations, 99), 2),
+                'p50_queries': percentile(queries, 50),
+                'p95_queries': percentile(queries, 95),
+                'max_queries': max(queries),
+            }
+        return result
+
+
+endpoint_stats = EndpointStats()
+
+
+class RequestMetricsMiddleware:
+    """
+    Per request: query count and SQL time, serialization time (views mark
+    it with timed_serialization), response render time, total time and
+    response size. Reported as a Server-Timing header and one JSON log
+    line on 'flashfiesta.requests', and aggregated per URL name in
+    endpoint_stats. Requests over their QUERY_BUDGETS entry are logged, or
+    raise QueryBudgetExceeded when QUERY_BUDGET_STRICT is set (tests).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        request._render_time = 0.0
+        request._serialize_time = 0.0
+        with track_queries() as queries:
+            response = self.get_response(request)
+        return self.report(request, response, queries, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        request._render_time = 0.0
+        request._serialize_time = 0.0
+        # Async views run their queries through sync_to_async, on the
+        # request's thread-sensitive thread; watch that thread's connections
+        queries = QueryStats()
+        wrappers = await sync_to_async(install_wrappers)(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrappers.close)()
+        return self.report(request, response, queries, time.perf_counter() - start)
+
+    def report(self, request, response, queries, total):
+        match = request.resolver_match
+        name = match.view_name if match else 'unresolved'
+        db_ms, total_ms = queries.duration * 1000, total * 1000
+        serialize_ms, render_ms = request._serialize_time * 1000, request._render_time * 1000
+        size = None if response.streaming else len(response.content)
+
+        if getattr(settings, 'REQUEST_METRICS_HEADER', True):
+            response['Server-Timing'] = (
+                f'db;dur={db_ms:.1f};desc="{queries.count} queries", '
+                f'serialize;dur={serialize_ms:.1f}, render;dur={render_ms:.1f}, total;dur={total_ms:.1f}'
+            )
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': name,
+            'status': response.status_code,
+            'queries': queries.count,
+            'db_ms': round(db_ms, 2),
+            'serialize_ms': round(serialize_ms, 2),
+            'render_ms': round(render_ms, 2),
+            'total_ms': round(total_ms, 2),
+            'bytes': size,
+        }))
+        endpoint_stats.record(name, total_ms, queries.count)
+
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(name)
+        if budget is not None and queries.count > budget:
+            message = f'{name} ran {queries.count} queries, budget is {budget}'
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; time that separately
+        render_start = time.perf_counter()
+
+        def rendered(response):
+            request._render_time = time.perf_counter() - render_start
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,143 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+CHUNK_SIZE = 64 * 1024
+
+
+def file_etag(st):
+    # Changes whenever the file is replaced or rewritten
+    return quote_etag(f'{st.st_mtime_ns:x}-{st.st_size:x}')
+
+
+def cache_control(path):
+    if path.startswith(tuple(getattr(settings, 'MEDIA_IMMUTABLE_PREFIXES', ()))):
+        # Content addressed: a name never points at different bytes
+        return IMMUTABLE
+    return f'public, max-age={getattr(settings, "MEDIA_MAX_AGE", 0)}'
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single "bytes=a-b" range, None to send the
+    whole file (no header, or several ranges), False when unsatisfiable.
+    """
+    match = RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final `last` bytes
+        length = int(last)
+        return (max(0, size - length), size - 1) if length else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def range_applies(request, etag, last_modified):
+    # If-Range: only honour the range while the file is still the same one
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(last_modified) <= since
+
+
+def read_range(path, start, end):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file under MEDIA_ROOT with validators, cache headers and byte
+    ranges. Unchanged files answer 304 without being opened. Whole files go
+    out through FileResponse, which WSGI servers send with os.sendfile, or
+    are handed to the front server with MEDIA_SENDFILE:
+
+        'x-accel-redirect'  nginx, with an internal location such as
+                            location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+        'x-sendfile'        Apache mod_xsendfile, lighttpd
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full_path)
+    except (SuspiciousFileOperation, ValueError, OSError):
+        raise Http404('File not found')
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404('File not found')
+
+    etag = file_etag(st)
+    last_modified = st.st_mtime
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is not None:
+        for header, value in headers.items():
+            response.headers.setdefault(header, value)
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    sendfile = getattr(settings, 'MEDIA_SENDFILE', '')
+    if sendfile == 'x-accel-redirect':
+        # nginx sends the body and handles ranges; Django only sets the headers
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + quote(path.lstrip('/'))
+        return response
+    if sendfile == 'x-sendfile':
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Sendfile'] = full_path
+        return response
+
+    byte_range = parse_range(request.META.get('HTTP_RANGE'), st.st_size)
+    if byte_range is not None and not range_applies(request, etag, last_modified):
+        byte_range = None
+    if byte_range is False:
+        response = HttpResponse(status=416, headers=headers)
+        response['Content-Range'] = f'bytes */{st.st_size}'
+        return response
+    if byte_range is not None:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(full_path, start, end), status=206, content_type=content_type, headers=headers,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+        return response
+
+    response = FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,125 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import BasePermission
+
+# UserProfile flags carried in the access token (always granted to owners)
+PERMISSION_FLAGS = ('can_view_stats', 'can_manage_products', 'can_manage_categories', 'can_manage_orders')
+CLAIM = 'store_perms'
+
+
+def granted_permissions(profile):
+    return {
+        'role': profile.role,
+        'perms': sorted(
+            flag for flag in PERMISSION_FLAGS
+            if profile.role == 'OWNER' or getattr(profile, flag)
+        ),
+    }
+
+
+def permission_claims(profile):
+    return {**granted_permissions(profile), 'version': profile.permissions_version}
+
+
+def stored_profile(user_id):
+    # Role, flags and version from one read, so they are one committed state
+    return apps.get_model('store', 'UserProfile').objects.only(
+        'user_id', 'role', 'permissions_version', *PERMISSION_FLAGS
+    ).get(user_id=user_id)
+
+
+def add_permission_claims(token, profile):
+    # Read again rather than trusting the caller's copy: a token is never
+    # issued with a version older than a change already committed
+    token[CLAIM] = permission_claims(stored_profile(profile.user_id))
+    return token
+
+
+def permissions_cache():
+    """
+    The cache holding current versions, shared by every process (Redis or
+    Memcached), or None when PERMISSIONS_CACHE_ALIAS is unset and every
+    check reads the database.
+    """
+    alias = settings.PERMISSIONS_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def version_cache_key(user_id):
+    return f'perm-version:{user_id}'
+
+
+def remember_permissions_version(user_id):
+    """
+    Publish the user's committed version. Call on commit of the transaction
+    that bumped it; the value is read back, so callbacks of two changes
+    running out of order still publish the latest one.
+    """
+    cache = permissions_cache()
+    if cache is None:
+        return
+    version = apps.get_model('store', 'UserProfile').objects.filter(user_id=user_id).values_list(
+        'permissions_version', flat=True
+    ).first()
+    if version is None:
+        cache.delete(version_cache_key(user_id))
+    else:
+        cache.set(version_cache_key(user_id), version, settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds())
+
+
+def request_permissions(request):
+    """
+    Role and granted flags for the authenticated user, taken from the
+    access token claims while their version is the one in the shared
+    cache. Otherwise (no cache, a miss, a token issued before a change or
+    before the claims existed) they come from the profile, in one query.
+    """
+    if not hasattr(request, '_store_permissions'):
+        token = request.auth
+        claims = token.get(CLAIM) if token is not None else None
+        cache = permissions_cache()
+        key = version_cache_key(request.user.pk)
+        version = cache.get(key) if cache is not None and claims is not None else None
+        if version is None or claims.get('version') != version:
+            profile = stored_profile(request.user.pk)
+            if cache is not None:
+                # add, so a newer version published meanwhile is kept
+                cache.add(key, profile.permissions_version, settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds())
+            claims = granted_permissions(profile)
+        request._store_permissions = claims
+    return request._store_permissions
+
+
+class HasStorePermission(BasePermission):
+    message = 'Access denied'
+    # UserProfile flag to require; None means owners only
+    flag = None
+
+    def has_permission(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return False
+        claims = request_permissions(request)
+        if self.flag is None:
+            return claims['role'] == 'OWNER'
+        return self.flag in claims['perms']
+
+
+class IsOwner(HasStorePermission):
+    message = 'Owner only'
+
+
+class CanViewStats(HasStorePermission):
+    flag = 'can_view_stats'
+
+
+class CanManageProducts(HasStorePermission):
+    flag = 'can_manage_products'
+
+
+class CanManageCategories(HasStorePermission):
+    flag = 'can_manage_categories'
+
+
+class CanManageOrders(HasStorePermission):
+    flag = 'can_manage_orders'
@@ -0,0 +1,138 @@
+import asyncio
+import functools
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, quote_etag
+
+# Versions are the time of the last change to what a response depends on,
+# so the newest one doubles as the response's Last-Modified.
+VERSION_PREFIX = 'response-cache-version:'
+KEY_PREFIX = 'response-cache:'
+CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+
+def response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def get_versions(names):
+    cache = response_cache()
+    keys = [VERSION_PREFIX + name for name in names]
+    found = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in found}
+    if missing:
+        # First use (or evicted): start now, which can only invalidate
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump_versions(*names):
+    cache = response_cache()
+    keys = [VERSION_PREFIX + name for name in names]
+    current = cache.get_many(keys)
+    now = time.time()
+    cache.set_many({key: max(now, current.get(key, 0) + 1e-6) for key in keys}, None)
+
+
+def is_cacheable(request):
+    # Only anonymous JSON GETs: authenticated responses carry per-user fields
+    return (
+        request.method in ('GET', 'HEAD')
+        and 'HTTP_AUTHORIZATION' not in request.META
+        and 'text/html' not in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+def not_modified(request, etag):
+    # ETag only: Last-Modified has whole seconds, and a version bumped
+    # within the same second would pass an If-Modified-Since check
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is None:
+        return False
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+
+def cache_key(request, versions):
+    params = urlencode(sorted(request.GET.lists()), doseq=True)
+    # Absolute URI: serialized media URLs depend on the host
+    fingerprint = '|'.join(
+        [request.build_absolute_uri(request.path), params] + [repr(version) for version in versions]
+    )
+    return KEY_PREFIX + hashlib.sha1(fingerprint.encode()).hexdigest()
+
+
+def cache_entry(response):
+    """The cacheable part of a fresh response, or None when it is not a success."""
+    data = getattr(response, 'data', None)
+    if response.status_code != 200 or (isinstance(data, dict) and data.get('Status') != 6000):
+        return None
+    if hasattr(response, 'render'):
+        response.render()
+    return {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'etag': quote_etag(hashlib.md5(response.content).hexdigest()),
+    }
+
+
+def cached_copy(request, entry, last_modified):
+    if not_modified(request, entry['etag']):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = CACHE_CONTROL
+    response['Vary'] = 'Accept, Authorization'
+    return response
+
+
+def cached_response(depends_on):
+    """
+    Cache a view's rendered JSON for anonymous requests. depends_on(request,
+    **kwargs) names the version keys the response depends on; bumping any of
+    them (bump_versions, from model signals) moves the view to a new cache
+    key. Responses carry ETag/Last-Modified and If-None-Match requests get 304.
+    Apply outside @api_view or @async_api_view.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not is_cacheable(request):
+                    return await view(request, *args, **kwargs)
+                versions = await sync_to_async(get_versions)(depends_on(request, **kwargs))
+                key = cache_key(request, versions)
+                entry = await response_cache().aget(key)
+                if entry is None:
+                    response = await view(request, *args, **kwargs)
+                    entry = cache_entry(response)
+                    if entry is None:
+                        return response
+                    await response_cache().aset(key, entry, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+                return cached_copy(request, entry, max(versions))
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_cacheable(request):
+                return view(request, *args, **kwargs)
+            versions = get_versions(depends_on(request, **kwargs))
+            key = cache_key(request, versions)
+            entry = response_cache().get(key)
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                entry = cache_entry(response)
+                if entry is None:
+                    return response
+                response_cache().set(key, entry, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+            return cached_copy(request, entry, max(versions))
+        return wrapper
+    return decorator
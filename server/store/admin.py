@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product, ProductImageGallery, Order, OrderItem, Category, Review, DashBoardSwiper, UserProfile
+from .models import Product, ProductImageGallery, Order, OrderItem, Category, Review, DashBoardSwiper, UserProfile, Task
 
 admin.site.register(Product)
 admin.site.register(ProductImageGallery)
@@ -20,3 +20,8 @@ class OrderItemInline(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'full_name', 'total_amount', 'status', 'created_at']
     inlines = [OrderItemInline]
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'priority', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'name']
@@ -0,0 +1,201 @@
+import itertools
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Trunc, TruncDate
+from django.utils import timezone
+
+from .models import DailyCategorySales, DailySalesRollup, Order, OrderItem, Product
+from .rollups import CANCELLED
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+DEFAULT_DAYS = 7
+MAX_BUCKETS = 1000
+
+LABEL_FORMATS = {
+    'hour': '%H:%M',
+    'day': '%a',
+    'week': '%d %b',
+    'month': '%b %Y',
+}
+
+
+class InvalidRange(ValueError):
+    pass
+
+
+def pending_orders():
+    """
+    Orders record_order_sales has not counted yet. The dashboard adds them
+    live, so its totals stay current when the task queue lags or no
+    worker runs; with a worker there are only a handful.
+    """
+    return Order.objects.filter(rolled_up=False)
+
+
+def dashboard_totals():
+    # Summed from the daily rollups (O(days)); see store.rollups
+    totals = DailySalesRollup.objects.aggregate(
+        total_orders=Sum('orders'),
+        total_revenue=Sum('revenue'),
+        cancelled_orders=Sum('cancelled_orders'),
+        cancelled_revenue=Sum('cancelled_revenue'),
+    )
+    pending = pending_orders().aggregate(
+        total_orders=Count('id'),
+        total_revenue=Sum('total_amount'),
+        cancelled_orders=Count('id', filter=Q(status=CANCELLED)),
+        cancelled_revenue=Sum('total_amount', filter=Q(status=CANCELLED)),
+    )
+    total_revenue = float(totals['total_revenue'] or 0) + float(pending['total_revenue'] or 0)
+    cancelled_revenue = float(totals['cancelled_revenue'] or 0) + float(pending['cancelled_revenue'] or 0)
+    return {
+        'total_orders': (totals['total_orders'] or 0) + pending['total_orders'],
+        'total_revenue': total_revenue,
+        'cancelled_orders': (totals['cancelled_orders'] or 0) + pending['cancelled_orders'],
+        'net_revenue': total_revenue - cancelled_revenue,
+        'total_products': Product.objects.count(),
+    }
+
+
+def truncate(moment, granularity):
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'hour':
+        return moment
+    moment = moment.replace(hour=0)
+    if granularity == 'week':
+        return moment - timedelta(days=moment.weekday())
+    if granularity == 'month':
+        return moment.replace(day=1)
+    return moment
+
+
+def next_bucket(moment, granularity):
+    if granularity == 'hour':
+        # Step in UTC so DST changes neither skip nor repeat an hour
+        return timezone.localtime(moment.astimezone(dt_timezone.utc) + timedelta(hours=1), moment.tzinfo)
+    if granularity == 'day':
+        return moment + timedelta(days=1)
+    if granularity == 'week':
+        return moment + timedelta(weeks=1)
+    if moment.month == 12:
+        return moment.replace(year=moment.year + 1, month=1)
+    return moment.replace(month=moment.month + 1)
+
+
+def parse_range(start=None, end=None, granularity=None):
+    """
+    Turn ?start=YYYY-MM-DD&end=YYYY-MM-DD&granularity= into an aware
+    [start, end) datetime range in the current time zone. Defaults to the
+    last DEFAULT_DAYS days including today, by day.
+    """
+    granularity = granularity or 'day'
+    if granularity not in GRANULARITIES:
+        raise InvalidRange(f'granularity must be one of {", ".join(GRANULARITIES)}')
+    try:
+        end_date = datetime.strptime(end, '%Y-%m-%d').date() if end else timezone.localdate()
+        start_date = (
+            datetime.strptime(start, '%Y-%m-%d').date() if start
+            else end_date - timedelta(days=DEFAULT_DAYS - 1)
+        )
+    except ValueError:
+        raise InvalidRange('Dates must be formatted as YYYY-MM-DD')
+    if start_date > end_date:
+        raise InvalidRange('start must not be after end')
+
+    tz = timezone.get_current_timezone()
+    range_start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    range_end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    return range_start, range_end, granularity
+
+
+def buckets(range_start, range_end, granularity):
+    tz = timezone.get_current_timezone()
+    result = []
+    bucket = truncate(timezone.localtime(range_start, tz), granularity)
+    while bucket < range_end:
+        if len(result) == MAX_BUCKETS:
+            raise InvalidRange(f'Range spans more than {MAX_BUCKETS} {granularity} buckets')
+        result.append(bucket)
+        bucket = next_bucket(bucket, granularity)
+    return result
+
+
+def sales_series(range_start, range_end, granularity='day'):
+    """
+    Order count and revenue per bucket for [range_start, range_end). Day and
+    coarser buckets are summed from the daily rollups; hourly buckets come
+    from one grouped query over Order. Empty buckets are filled with zeros.
+    """
+    tz = timezone.get_current_timezone()
+    bucket_starts = buckets(range_start, range_end, granularity)
+    totals = {bucket: [0, 0.0] for bucket in bucket_starts}
+
+    if granularity == 'hour':
+        rows = (
+            Order.objects.filter(created_at__gte=range_start, created_at__lt=range_end)
+            .annotate(bucket=Trunc('created_at', granularity, tzinfo=tz))
+            .values_list('bucket')
+            .annotate(sales=Count('id'), revenue=Sum('total_amount'))
+            .order_by()
+        )
+    else:
+        days = DailySalesRollup.objects.filter(
+            date__gte=timezone.localtime(range_start, tz).date(),
+            date__lt=timezone.localtime(range_end, tz).date(),
+        ).values_list('date', 'orders', 'revenue')
+        pending = (
+            pending_orders().filter(created_at__gte=range_start, created_at__lt=range_end)
+            .annotate(day=TruncDate('created_at', tzinfo=tz))
+            .values_list('day')
+            .annotate(sales=Count('id'), revenue=Sum('total_amount'))
+            .order_by()
+        )
+        rows = [
+            (truncate(timezone.make_aware(datetime.combine(date, time.min), tz), granularity), orders, revenue)
+            for date, orders, revenue in itertools.chain(days, pending)
+        ]
+    for bucket, sales, revenue in rows:
+        if bucket in totals:
+            totals[bucket][0] += sales
+            totals[bucket][1] += float(revenue or 0)
+
+    label_format = LABEL_FORMATS[granularity]
+    if granularity == 'day' and len(bucket_starts) > DEFAULT_DAYS:
+        label_format = '%d %b'
+
+    return [
+        {
+            'name': bucket.strftime(label_format),
+            'date': bucket.isoformat(),
+            'sales': totals[bucket][0],
+            'revenue': totals[bucket][1],
+        }
+        for bucket in bucket_starts
+    ]
+
+
+def category_sales(range_start, range_end):
+    tz = timezone.get_current_timezone()
+    rows = DailyCategorySales.objects.filter(
+        date__gte=timezone.localtime(range_start, tz).date(),
+        date__lt=timezone.localtime(range_end, tz).date(),
+    ).values('category_id', 'category__name').annotate(
+        units=Sum('units'), revenue=Sum('revenue')
+    ).order_by()
+    pending = OrderItem.objects.filter(
+        order__in=pending_orders().filter(created_at__gte=range_start, created_at__lt=range_end)
+    ).values(category_id=F('product__category_id'), category__name=F('product__category__name')).annotate(
+        units=Sum('quantity'), revenue=Sum(F('quantity') * F('price'))
+    ).order_by()
+    totals = {}
+    for row in itertools.chain(rows, pending):
+        entry = totals.setdefault(row['category_id'], {
+            'category': row['category_id'],
+            'name': row['category__name'] or 'Uncategorized',
+            'units': 0,
+            'revenue': 0.0,
+        })
+        entry['units'] += row['units']
+        entry['revenue'] += float(row['revenue'] or 0)
+    return sorted(totals.values(), key=lambda entry: -entry['revenue'])
@@ -0,0 +1,220 @@
+import bisect
+import itertools
+import logging
+import threading
+import time
+import unicodedata
+
+from django.db import connection
+from django.db.models import Sum
+
+from .models import OrderItem, Product
+
+logger = logging.getLogger('flashfiesta.autocomplete')
+
+TRENDING_WEIGHT = 100
+# Ranked products kept per looked-up prefix, so a query ranks its prefix
+# range once rather than on every keystroke. Prefixes up to
+# PRECOMPUTED_LENGTH characters, whose ranges are the largest, are ranked
+# while building.
+TOP_K = 20
+PRECOMPUTED_LENGTH = 2
+MAX_CACHED_PREFIXES = 50000
+# Signals only reach the worker that saved the product, so every process
+# also rebuilds periodically, in the background, to pick up other
+# workers' writes and sales.
+REBUILD_INTERVAL = 15 * 60
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+class SuggestionIndex:
+    """
+    Sorted-array prefix index over normalized product names. Every word
+    start in a name is a key, so "run" matches "Sneaker Runner". A prefix's
+    best TOP_K products are ranked from a bisect and scan of its range the
+    first time it is looked up, then kept until a product under it
+    changes. Lookups never hit the DB and never wait for a build: a stale
+    index is rebuilt on a background thread while lookups use the previous
+    one.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._keys = []  # sorted (key, pk)
+        self._products = {}  # pk -> (name, normalized name, trending, units sold)
+        self._top = {}  # prefix -> best TOP_K pks, best first
+        self._loaded = False
+        self._built_at = None
+        self._generation = 0  # bumped by invalidate()
+        self._changes = None  # upserts and removes seen while a build reads the DB
+        self._refreshing = None  # background build thread
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        """Rebuild from the DB, one build at a time. Lookups use the previous build meanwhile."""
+        with self._build_lock:
+            with self._lock:
+                generation = self._generation
+                self._changes = []
+            try:
+                products, keys, top = self._load()
+            except BaseException:
+                with self._lock:
+                    self._changes = None
+                raise
+            with self._lock:
+                self._products = products
+                self._keys = keys
+                self._top = top
+                self._loaded = True
+                # The signals applied these to the previous build; this one
+                # may have read the rows before they were written
+                for change in self._changes:
+                    change[0](*change[1:])
+                self._changes = None
+                # An invalidate() during the build may not be in what it read
+                self._built_at = time.monotonic() if generation == self._generation else None
+
+    def refresh(self):
+        """Build on a background thread, unless one is already running."""
+        with self._lock:
+            if self._refreshing is not None:
+                return self._refreshing
+            self._refreshing = threading.Thread(target=self._refresh, name='suggestion-index', daemon=True)
+            self._refreshing.start()
+            return self._refreshing
+
+    def _refresh(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Rebuilding the suggestion index failed')
+        finally:
+            with self._lock:
+                self._refreshing = None
+            connection.close()
+
+    def _load(self):
+        units = dict(
+            OrderItem.objects.values('product_id').annotate(units=Sum('quantity')).values_list('product_id', 'units')
+        )
+        products = {}
+        keys = []
+        for pk, name, trending in Product.objects.values_list('id', 'ProductName', 'is_trending'):
+            if not name:
+                continue
+            products[pk] = (name, normalize(name), trending, units.get(pk, 0))
+            keys.extend((key, pk) for key in self._name_keys(name))
+        keys.sort()
+        short = {key[:length] for key, pk in keys for length in range(1, PRECOMPUTED_LENGTH + 1)}
+        top = {prefix: self._rank(keys, products, prefix)[:TOP_K] for prefix in short}
+        return products, keys, top
+
+    @property
+    def needs_build(self):
+        return self._built_at is None or time.monotonic() - self._built_at > REBUILD_INTERVAL
+
+    @staticmethod
+    def _name_keys(name):
+        normalized = normalize(name)
+        keys = [normalized]
+        for index, char in enumerate(normalized):
+            if char == ' ':
+                keys.append(normalized[index + 1:])
+        return keys
+
+    @staticmethod
+    def _rank(keys, products, prefix):
+        """Product ids under prefix, best first: popularity, then matches at the start of the name."""
+        best = {}
+        for key, pk in itertools.islice(keys, bisect.bisect_left(keys, (prefix,)), None):
+            if not key.startswith(prefix):
+                break
+            name, normalized, trending, units = products[pk]
+            rank = (units + (TRENDING_WEIGHT if trending else 0), normalized.startswith(prefix))
+            if rank > best.get(pk, (-1, False)):
+                best[pk] = rank
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], not item[1][1], products[item[0]][0]))
+        return [pk for pk, rank in ranked]
+
+    def _forget_prefixes(self, name):
+        # Drop the ranked lists a change to this name can affect
+        for key in self._name_keys(name):
+            for length in range(1, len(key) + 1):
+                self._top.pop(key[:length], None)
+
+    def upsert(self, product):
+        with self._lock:
+            self._record(self._upsert, product.pk, product.ProductName, product.is_trending)
+
+    def _upsert(self, pk, name, trending):
+        units = self._products.get(pk, (None, None, None, 0))[3]
+        self._discard(pk)
+        if not name:
+            return
+        self._forget_prefixes(name)
+        self._products[pk] = (name, normalize(name), trending, units)
+        for key in self._name_keys(name):
+            bisect.insort(self._keys, (key, pk))
+
+    def invalidate(self):
+        # Rebuild on the next lookup, e.g. after a bulk import
+        with self._lock:
+            self._generation += 1
+            self._built_at = None
+
+    def remove(self, pk):
+        with self._lock:
+            self._record(self._discard, pk)
+
+    def _record(self, change, *args):
+        # Called with the lock held
+        if self._changes is not None:
+            self._changes.append((change, *args))
+        if self._loaded:
+            change(*args)
+
+    def _discard(self, pk):
+        entry = self._products.pop(pk, None)
+        if entry is None:
+            return
+        self._forget_prefixes(entry[0])
+        for key in self._name_keys(entry[0]):
+            index = bisect.bisect_left(self._keys, (key, pk))
+            if index < len(self._keys) and self._keys[index] == (key, pk):
+                del self._keys[index]
+
+    def suggest(self, query, limit=5):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        if self.needs_build:
+            self.refresh()
+        with self._lock:
+            if limit > TOP_K:
+                ranked = self._rank(self._keys, self._products, prefix)
+            else:
+                ranked = self._top.get(prefix)
+                if ranked is None:
+                    if len(self._top) >= MAX_CACHED_PREFIXES:
+                        self._top.clear()
+                    ranked = self._top[prefix] = self._rank(self._keys, self._products, prefix)[:TOP_K]
+            suggestions = []
+            for pk in ranked:
+                name = self._products[pk][0]
+                if name not in suggestions:
+                    suggestions.append(name)
+                if len(suggestions) == limit:
+                    break
+            return suggestions
+
+suggestion_index = SuggestionIndex()
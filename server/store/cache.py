@@ -0,0 +1,40 @@
+from core.response_cache import bump_versions
+
+# Version names for the cached public catalog responses (core.response_cache)
+PRODUCTS = 'products'
+CATEGORIES = 'categories'
+
+
+def product_version(pk):
+    return f'product:{pk}'
+
+
+def product_list_versions(request, **kwargs):
+    # Listings embed category details
+    return [PRODUCTS, CATEGORIES]
+
+
+def product_detail_versions(request, pk, **kwargs):
+    return [product_version(pk), CATEGORIES]
+
+
+def category_list_versions(request, **kwargs):
+    return [CATEGORIES]
+
+
+def products_changed(*product_ids):
+    bump_versions(PRODUCTS, *(product_version(pk) for pk in product_ids))
+
+
+def product_stock_changed(*product_ids):
+    """
+    After checkouts move stock: only the products' own responses are
+    refreshed. Listings keep their stock levels until they expire
+    (RESPONSE_CACHE_TIMEOUT), so a flash sale does not empty the listing
+    cache on every order; live levels reach clients as stock events.
+    """
+    bump_versions(*(product_version(pk) for pk in product_ids))
+
+
+def categories_changed():
+    bump_versions(CATEGORIES)
@@ -0,0 +1,246 @@
+import codecs
+import csv
+import itertools
+import json
+
+from django.db import transaction
+from django.db.models import Max
+
+from .autocomplete import suggestion_index
+from .cache import products_changed
+from .inventory import set_stock, sharded_product_ids, stock_expression
+from .models import Category, Product
+from .search import update_search_vectors
+
+FORMATS = ('csv', 'jsonl')
+# File column -> Product field; "category" holds the category name
+COLUMNS = {
+    'ProductID': 'ProductID',
+    'ProductName': 'ProductName',
+    'ProductDescription': 'ProductDescription',
+    'ProductPrice': 'ProductPrice',
+    'ProductQuantity': 'ProductQuantity',
+    'category': 'category',
+    'is_trending': 'is_trending',
+    'ProductImage': 'ProductImage',
+}
+# stock: the slot total for sharded products, whose ProductQuantity lags
+EXPORT_VALUES = [
+    'ProductID', 'ProductName', 'ProductDescription', 'ProductPrice', 'stock',
+    'category__name', 'is_trending', 'ProductImage',
+]
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def next_product_id():
+    """The ProductID for a product created outside an import, which export and re-import key on."""
+    return (Product.objects.aggregate(last=Max('ProductID'))['last'] or 0) + 1
+
+
+def format_for(filename, default='csv'):
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+    return extension if extension in FORMATS else default
+
+
+def read_rows(stream, format):
+    """
+    Yield (line number, row dict) from a binary CSV or JSON Lines stream.
+    A file that is not UTF-8 or not parseable CSV raises InvalidImport
+    when the reader reaches the bad bytes; earlier batches stay imported.
+    """
+    try:
+        yield from parse_rows(stream, format)
+    except UnicodeDecodeError:
+        raise InvalidImport('The file is not UTF-8 encoded')
+    except csv.Error as e:
+        raise InvalidImport(f'The file is not valid CSV: {e}')
+
+
+def parse_rows(stream, format):
+    text = codecs.getreader('utf-8-sig')(stream)
+    if format == 'csv':
+        reader = csv.DictReader(text)
+        if not reader.fieldnames or 'ProductID' not in reader.fieldnames:
+            raise InvalidImport('The CSV header must include ProductID')
+        for row in reader:
+            yield reader.line_num, row
+    elif format == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row
+    else:
+        raise InvalidImport(f'Unknown format {format!r}, expected one of {", ".join(FORMATS)}')
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def parse_number(value, cast, name):
+    try:
+        number = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+    if number < 0:
+        raise ValueError(f'{name} must not be negative')
+    return number
+
+
+def build_product(row, categories):
+    """
+    Validate one row into (unsaved Product, fields it sets); raises
+    ValueError. Empty cells leave the field alone, except category, where
+    an empty value clears it.
+    """
+    if not isinstance(row, dict):
+        raise ValueError('Row is not an object')
+    product_id = parse_number(row.get('ProductID'), int, 'ProductID')
+    product = Product(ProductID=product_id, ProductQuantity=0, ProductImage='')
+    fields = []
+    for column, value in row.items():
+        if column not in COLUMNS or column == 'ProductID':
+            continue
+        if column == 'category':
+            if value not in (None, '') and value not in categories:
+                raise ValueError(f'Unknown category {value!r}')
+            product.category_id = categories.get(value)
+            fields.append('category')
+            continue
+        if value is None or value == '':
+            continue
+        if column == 'ProductPrice':
+            value = parse_number(value, float, column)
+        elif column == 'ProductQuantity':
+            value = parse_number(value, int, column)
+        elif column == 'is_trending':
+            value = parse_bool(value)
+        else:
+            value = str(value)
+        setattr(product, COLUMNS[column], value)
+        fields.append(COLUMNS[column])
+    return product, tuple(sorted(fields))
+
+
+def report_error(summary, line_number, message):
+    summary['error_count'] += 1
+    if len(summary['errors']) < MAX_REPORTED_ERRORS:
+        summary['errors'].append({'line': line_number, 'error': message})
+
+
+def import_batch(batch, create_categories, summary):
+    names = {row.get('category') for _, row in batch if isinstance(row, dict) and row.get('category')}
+    categories = {}
+    if names:
+        # Names are not unique; the first match wins
+        for pk, name in Category.objects.filter(name__in=names).order_by('name', 'id').values_list('id', 'name'):
+            categories.setdefault(name, pk)
+        if create_categories:
+            created = Category.objects.bulk_create([Category(name=name) for name in sorted(names - set(categories))])
+            categories.update((category.name, category.pk) for category in created)
+
+    parsed = {}
+    for line_number, row in batch:
+        try:
+            product, fields = build_product(row, categories)
+        except ValueError as e:
+            report_error(summary, line_number, str(e))
+            continue
+        # A repeated ProductID keeps its last row
+        parsed[product.ProductID] = (line_number, product, fields)
+
+    existing = set(Product.objects.filter(ProductID__in=parsed).values_list('ProductID', flat=True))
+    groups = {}
+    for product_id, (line_number, product, fields) in parsed.items():
+        if product_id not in existing and not product.ProductName:
+            report_error(summary, line_number, 'ProductName is required for new products')
+            continue
+        groups.setdefault(fields, []).append(product)
+    if not groups:
+        return
+    product_ids = [product.ProductID for products in groups.values() for product in products]
+
+    with transaction.atomic():
+        # One upsert per set of provided columns, so a row never overwrites
+        # a field it did not mention
+        for fields, products in groups.items():
+            if fields:
+                Product.objects.bulk_create(
+                    products, update_conflicts=True, unique_fields=['ProductID'], update_fields=list(fields),
+                )
+            else:
+                Product.objects.bulk_create(products, ignore_conflicts=True)
+        # The upsert bypasses save() and its signals, and rows that already
+        # existed keep their own ids, so look them up and refresh what the
+        # signals would have.
+        ids = list(Product.objects.filter(ProductID__in=product_ids).values_list('pk', flat=True))
+        update_search_vectors(product_ids=ids)
+        # The upsert only wrote ProductQuantity; move sharded stock into the
+        # slots when a row asks for a different level than they hold
+        quantities = {
+            product.ProductID: product.ProductQuantity
+            for fields, products in groups.items() if 'ProductQuantity' in fields
+            for product in products
+        }
+        if quantities:
+            stocked = {
+                str(pk): product_id
+                for pk, product_id in Product.objects.filter(ProductID__in=quantities).values_list('pk', 'ProductID')
+            }
+            for pk in sharded_product_ids(stocked):
+                set_stock(pk, quantities[stocked[pk]])
+        transaction.on_commit(lambda: products_changed(*ids))
+
+    summary['created'] += len(set(product_ids) - existing)
+    summary['updated'] += len(set(product_ids) & existing)
+
+
+def import_products(stream, format='csv', batch_size=BATCH_SIZE, create_categories=False):
+    """
+    Upsert products by ProductID from a CSV or JSON Lines stream, batch by
+    batch. Existing products only get the fields their row provides.
+    Invalid rows are skipped and reported. Returns a summary.
+    """
+    summary = {'created': 0, 'updated': 0, 'error_count': 0, 'errors': []}
+    rows = read_rows(stream, format)
+    while batch := list(itertools.islice(rows, batch_size)):
+        import_batch(batch, create_categories, summary)
+    suggestion_index.invalidate()
+    return summary
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def export_products(format='csv', queryset=None):
+    """
+    Yield the catalog as CSV or JSON Lines text chunks, one per product,
+    reading rows through a server-side cursor so memory stays flat.
+    """
+    if format not in FORMATS:
+        raise InvalidImport(f'Unknown format {format!r}, expected one of {", ".join(FORMATS)}')
+    if queryset is None:
+        queryset = Product.objects.all()
+    rows = queryset.annotate(stock=stock_expression()).order_by('ProductID', 'id').values_list(*EXPORT_VALUES).iterator(chunk_size=2000)
+    header = list(COLUMNS)
+    if format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(header, row))) + '\n'
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .models import Task
+
+
+@register()
+def check_task_worker(app_configs, **kwargs):
+    """
+    Warn when tasks have been waiting longer than TASK_WORKER_GRACE and no
+    worker has claimed one in that time, i.e. nothing runs `run_tasks`.
+    """
+    if settings.TASKS_EAGER:
+        return []
+    since = timezone.now() - settings.TASK_WORKER_GRACE
+    try:
+        waiting = Task.objects.filter(status=Task.QUEUED, run_at__lt=since).exists()
+        claimed = Task.objects.filter(locked_at__gte=since).exists()
+    except DatabaseError:
+        # Not migrated yet, or no database to ask
+        return []
+    if not waiting or claimed:
+        return []
+    return [Warning(
+        f'Queued tasks have waited over {settings.TASK_WORKER_GRACE} and no worker has claimed any',
+        hint=(
+            'Start `manage.py run_tasks`, or set TASKS_EAGER=true. Until then image derivatives and gallery '
+            'uploads are not attached, and the dashboard aggregates the uncounted orders on every request.'
+        ),
+        id='store.W001',
+    )]
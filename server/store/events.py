@@ -0,0 +1,50 @@
+from django.db import transaction
+
+from core.events import publish
+
+from .inventory import current_stock
+
+# Channels pushed by the order event stream. Staff who manage orders follow
+# ORDERS; customers follow their own orders only.
+ORDERS = 'orders'
+STOCK = 'stock'
+# Products per stock event: about 50 bytes each, well under the 8000 byte
+# NOTIFY limit
+STOCK_EVENT_SIZE = 100
+
+
+def user_orders(user_id):
+    return f'orders.{user_id}'
+
+
+def publish_order(order, type, data):
+    publish(ORDERS, type, data)
+    if order.user_id is not None:
+        publish(user_orders(order.user_id), type, data)
+
+
+def order_created(order):
+    data = {
+        'order_id': str(order.pk),
+        'status': order.status,
+        'total_amount': order.total_amount,
+        'created_at': order.created_at,
+    }
+    transaction.on_commit(lambda: publish_order(order, 'order.created', data))
+
+
+def order_status_changed(order, old_status):
+    data = {'order_id': str(order.pk), 'status': order.status, 'previous_status': old_status}
+    transaction.on_commit(lambda: publish_order(order, 'order.status', data))
+
+
+def publish_stock(product_ids):
+    levels = list(current_stock(product_ids).items())
+    # Split so each event fits in a Postgres NOTIFY payload
+    for start in range(0, len(levels), STOCK_EVENT_SIZE):
+        publish(STOCK, 'stock', {'products': dict(levels[start:start + STOCK_EVENT_SIZE])})
+
+
+def stock_changed(*product_ids):
+    # Read once committed, so the levels sent are the ones other requests see
+    transaction.on_commit(lambda: publish_stock(product_ids))
@@ -0,0 +1,178 @@
+import hashlib
+import io
+import logging
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .cache import categories_changed, products_changed
+from .models import Product, ProductImageGallery
+from .tasks import HIGH, task
+
+logger = logging.getLogger('flashfiesta.images')
+
+# Longest width per size; images are never upscaled
+SIZES = {'thumb': 160, 'card': 480, 'detail': 1200}
+QUALITY = {'avif': 50, 'webp': 80, 'jpeg': 82}
+SAVE_OPTIONS = {
+    'avif': {'speed': 6},
+    'webp': {'method': 4},
+    'jpeg': {'optimize': True, 'progressive': True},
+}
+# model label -> (image field, manifest field)
+IMAGE_FIELDS = {
+    'store.Product': ('ProductImage', 'image_variants'),
+    'store.ProductImageGallery': ('image', 'variants'),
+    'store.Category': ('image', 'image_variants'),
+    'store.DashBoardSwiper': ('categoryImage', 'image_variants'),
+}
+
+
+def formats():
+    """Encodings this Pillow build can write, preferred first; JPEG is the fallback."""
+    Image.init()
+    return [format for format in ('avif', 'webp') if format.upper() in Image.SAVE] + ['jpeg']
+
+
+def derivative_name(digest, size, format):
+    # Content addressed: the same upload shares its derivatives across rows
+    return f'derivatives/{digest[:2]}/{digest}/{size}.{format}'
+
+
+def encode(image, format):
+    if format == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, format.upper(), quality=QUALITY[format], **SAVE_OPTIONS[format])
+    return buffer.getvalue()
+
+
+def generate_derivatives(storage, name):
+    """
+    Resize the stored image `name` to every size in SIZES and encode each
+    in every available format. Derivatives already in storage are reused.
+    Returns the manifest kept on the row:
+
+        {'source': name, 'digest': ..., 'width': 2400, 'height': 1600,
+         'sizes': {'thumb': {'width': 160, 'height': 107,
+                             'formats': {'webp': 'derivatives/...', ...}}, ...}}
+    """
+    with storage.open(name, 'rb') as handle:
+        data = handle.read()
+    digest = hashlib.sha256(data).hexdigest()
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    width, height = image.size
+
+    available = formats()
+    sizes = {}
+    # Largest first, each resized from the previous one
+    for size, target in sorted(SIZES.items(), key=lambda item: -item[1]):
+        if target < image.width:
+            image = image.resize((target, max(1, round(image.height * target / image.width))), Image.LANCZOS)
+        encoded = {}
+        for format in available:
+            path = derivative_name(digest, size, format)
+            if not storage.exists(path):
+                path = storage.save(path, ContentFile(encode(image, format)))
+            encoded[format] = path
+        sizes[size] = {'width': image.width, 'height': image.height, 'formats': encoded}
+    return {'source': name, 'digest': digest, 'width': width, 'height': height, 'sizes': sizes}
+
+
+def needs_derivatives(name, manifest):
+    return bool(name) and (manifest or {}).get('source') != name
+
+
+@task(max_attempts=3, retry_delay=60)
+def build_derivatives(label, pk, name):
+    """Build and store the manifest for one row, unless its image changed meanwhile."""
+    model = apps.get_model(label)
+    image_field, manifest_field = IMAGE_FIELDS[label]
+    try:
+        manifest = generate_derivatives(model._meta.get_field(image_field).storage, name)
+    except FileNotFoundError:
+        # Retrying will not bring it back
+        logger.warning('Image %s of %s %s is missing from storage', name, label, pk)
+        return None
+    # update() skips post_save, so this does not schedule itself again
+    if model.objects.filter(pk=pk, **{image_field: name}).update(**{manifest_field: manifest}):
+        transaction.on_commit(lambda: changed(label, pk))
+    return manifest
+
+
+def changed(label, pk):
+    if label == 'store.Product':
+        products_changed(pk)
+    elif label == 'store.ProductImageGallery':
+        products_changed(*ProductImageGallery.objects.filter(pk=pk).values_list('product_id', flat=True))
+    elif label == 'store.Category':
+        categories_changed()
+
+
+def schedule(instance, priority=None):
+    """Queue derivatives for an instance whose image has none yet."""
+    label = instance._meta.label
+    image_field, manifest_field = IMAGE_FIELDS[label]
+    name = getattr(instance, image_field).name
+    if needs_derivatives(name, getattr(instance, manifest_field)):
+        build_derivatives.enqueue(priority=priority, label=label, pk=str(instance.pk), name=name)
+
+
+def save_gallery_uploads(product, uploads):
+    """
+    Store uploaded gallery files and queue the task that attaches them to
+    the product. Only the file copies happen in the request.
+    """
+    field = ProductImageGallery._meta.get_field('image')
+    names = [field.storage.save(field.generate_filename(None, upload.name), upload) for upload in uploads]
+    if names:
+        attach_gallery_images.enqueue(product_id=str(product.pk), names=names)
+    return names
+
+
+@task(priority=HIGH)
+def attach_gallery_images(product_id, names):
+    if not Product.objects.filter(pk=product_id).exists():
+        return
+    images = ProductImageGallery.objects.bulk_create(
+        [ProductImageGallery(product_id=product_id, image=name) for name in names]
+    )
+    # bulk_create sends no post_save
+    for image in images:
+        schedule(image)
+    transaction.on_commit(lambda: products_changed(product_id))
+
+
+def variant_urls(manifest, request=None):
+    """
+    Serializer shape of a manifest: per size its dimensions and one URL per
+    format, plus a ready-made srcset string per format.
+    """
+    if not manifest or not manifest.get('sizes'):
+        return None
+
+    def url(path):
+        value = default_storage.url(path)
+        return request.build_absolute_uri(value) if request is not None else value
+
+    result = {}
+    srcset = {}
+    widths = set()
+    for size, variant in sorted(manifest['sizes'].items(), key=lambda item: item[1]['width']):
+        result[size] = {'width': variant['width'], 'height': variant['height']}
+        for format, path in variant['formats'].items():
+            result[size][format] = url(path)
+        # Small originals give several sizes the same width; list it once
+        if variant['width'] not in widths:
+            widths.add(variant['width'])
+            for format in variant['formats']:
+                srcset.setdefault(format, []).append(f'{result[size][format]} {variant["width"]}w')
+    result['srcset'] = {format: ', '.join(entries) for format, entries in srcset.items()}
+    return result
@@ -0,0 +1,157 @@
+import random
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .cache import product_stock_changed, products_changed
+from .models import Product, StockSlot
+
+# Hot products keep their stock in StockSlot rows instead of
+# Product.ProductQuantity, so concurrent checkouts decrement different rows
+# rather than queueing on one lock. Checkouts never write a sharded
+# product's row: its ProductQuantity is a snapshot that readers replace with
+# the slot total (stock_expression, current_stock), copied back by
+# reconcile_stock (manage.py shard_stock --reconcile, run periodically).
+
+
+def split_quantity(total, slots):
+    base, extra = divmod(max(total, 0), slots)
+    return [base + (1 if index < extra else 0) for index in range(slots)]
+
+
+def sharded_product_ids(product_ids):
+    return {
+        str(pk) for pk in
+        StockSlot.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True).distinct()
+    }
+
+
+def shard_stock(product, slots):
+    # Re-splitting a sharded product keeps the stock currently in its slots
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        # Locked, so no reservation can land between the sum and the delete
+        current = list(StockSlot.objects.select_for_update().filter(product=product).values_list('quantity', flat=True))
+        total = sum(current) if current else product.ProductQuantity
+        StockSlot.objects.filter(product=product).delete()
+        StockSlot.objects.bulk_create([
+            StockSlot(product=product, slot=index, quantity=quantity)
+            for index, quantity in enumerate(split_quantity(total, slots))
+        ])
+        Product.objects.filter(pk=product.pk).update(ProductQuantity=total)
+    return total
+
+
+def merge_stock(product):
+    with transaction.atomic():
+        slots = list(StockSlot.objects.select_for_update().filter(product=product).values_list('quantity', flat=True))
+        if not slots:
+            return None
+        total = sum(slots)
+        StockSlot.objects.filter(product=product).delete()
+        Product.objects.filter(pk=product.pk).update(ProductQuantity=total)
+    products_changed(product.pk)
+    return total
+
+
+def set_stock(product_id, quantity):
+    """
+    Set a product's stock as an explicit edit (Update_Product, imports).
+    A sharded product's slots are locked and only re-split when quantity
+    differs from what they hold, so posting back the current level (an
+    untouched form field, a re-imported export) never restores sold units.
+    Returns True if the stock changed.
+    """
+    with transaction.atomic():
+        slots = list(StockSlot.objects.select_for_update().filter(product_id=product_id).order_by('slot'))
+        if not slots:
+            changed = bool(
+                Product.objects.filter(pk=product_id).exclude(ProductQuantity=quantity).update(ProductQuantity=quantity)
+            )
+        else:
+            changed = sum(slot.quantity for slot in slots) != quantity
+            if changed:
+                for slot, share in zip(slots, split_quantity(quantity, len(slots))):
+                    slot.quantity = share
+                StockSlot.objects.bulk_update(slots, ['quantity'])
+            Product.objects.filter(pk=product_id).update(ProductQuantity=quantity)
+        transaction.on_commit(lambda: products_changed(product_id))
+    return changed
+
+
+def reconcile_stock(product_ids=None):
+    totals = StockSlot.objects.all()
+    if product_ids is not None:
+        totals = totals.filter(product_id__in=product_ids)
+    totals = totals.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total')
+    for product_id, total in totals:
+        Product.objects.filter(pk=product_id).update(ProductQuantity=total)
+    product_stock_changed(*(product_id for product_id, total in totals))
+    return len(totals)
+
+
+def reserve_stock(product_id, qty):
+    """
+    Take qty from a sharded product's slots. Must run inside the caller's
+    transaction. Tries single slots from a random starting point first; only
+    when no slot holds qty on its own are all slots locked and drained in
+    order. Returns False if the slots do not hold qty in total.
+    """
+    slot_numbers = sorted(StockSlot.objects.filter(product_id=product_id).values_list('slot', flat=True))
+    if not slot_numbers:
+        # Merged since the caller looked; the stock is back on the product
+        return bool(
+            Product.objects.filter(pk=product_id, ProductQuantity__gte=qty).update(
+                ProductQuantity=F('ProductQuantity') - qty
+            )
+        )
+    return take_from_slots(product_id, slot_numbers, qty)
+
+
+def take_from_slots(product_id, slot_numbers, qty):
+    start = random.randrange(len(slot_numbers))
+    for slot in slot_numbers[start:] + slot_numbers[:start]:
+        updated = StockSlot.objects.filter(
+            product_id=product_id, slot=slot, quantity__gte=qty
+        ).update(quantity=F('quantity') - qty)
+        if updated:
+            return True
+
+    slots = list(StockSlot.objects.select_for_update().filter(product_id=product_id).order_by('slot'))
+    if sum(slot.quantity for slot in slots) < qty:
+        return False
+    remaining = qty
+    for slot in slots:
+        take = min(slot.quantity, remaining)
+        if take > 0:
+            StockSlot.objects.filter(pk=slot.pk).update(quantity=F('quantity') - take)
+            remaining -= take
+        if not remaining:
+            break
+    return True
+
+
+def stock_expression(prefix=''):
+    """
+    A product's current stock for annotating a query: the slot total for
+    sharded products, ProductQuantity otherwise. prefix is the lookup path
+    to the product, e.g. 'product__' from a CartItem query.
+    """
+    slots = StockSlot.objects.filter(product_id=OuterRef(f'{prefix}pk')).values('product_id').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    return Coalesce(Subquery(slots), F(f'{prefix}ProductQuantity'))
+
+
+def current_stock(product_ids):
+    """Stock left per product id, counted from the slots for sharded products."""
+    stock = {
+        str(pk): quantity
+        for pk, quantity in Product.objects.filter(pk__in=product_ids).values_list('pk', 'ProductQuantity')
+    }
+    slots = StockSlot.objects.filter(product_id__in=product_ids).values('product_id').annotate(
+        total=Sum('quantity')
+    ).values_list('product_id', 'total')
+    stock.update((str(product_id), total) for product_id, total in slots)
+    return stock
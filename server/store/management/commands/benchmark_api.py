@@ -0,0 +1,232 @@
+import json
+import logging
+import platform
+import random
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from core.authentication import user_cache
+from core.instrumentation import percentile, track_queries
+from Flash_Fiesta.api.auth.views import get_tokens_for_user
+from store.models import Product
+from store.synthetic import ADJECTIVES, BASE_DATE, NOUNS, seed_catalog
+
+# Benchmarks never share cache entries with the running site
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-responses'},
+}
+
+
+@contextmanager
+def benchmark_environment(keepdb=False):
+    """
+    A throwaway test database and private caches for the duration of a
+    benchmark, with the per-request log line silenced.
+    """
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    request_logger = logging.getLogger('flashfiesta.requests')
+    request_logger.disabled = True
+    try:
+        with override_settings(CACHES=BENCHMARK_CACHES, QUERY_BUDGET_STRICT=False):
+            user_cache.clear()
+            call_command('flush', interactive=False, verbosity=0)
+            yield
+    finally:
+        request_logger.disabled = False
+        user_cache.clear()
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+class Scenarios:
+    """One method per benchmarked call; each issues a single request."""
+
+    def __init__(self, owner, customer, product_ids, rng):
+        self.owner = self.client_for(owner)
+        self.customer = self.client_for(customer)
+        self.anonymous = Client()
+        self.product_ids = product_ids
+        self.rng = rng
+
+    @staticmethod
+    def client_for(user):
+        return Client(HTTP_AUTHORIZATION=f'Bearer {get_tokens_for_user(user)["access"]}')
+
+    def all(self):
+        return {
+            'ProductView': self.product_list,
+            'ProductView anonymous (cached)': self.product_list_anonymous,
+            'ProductView search': self.product_search,
+            'ProductDetailView': self.product_detail,
+            'Search_Suggestions': self.suggestions,
+            'Sync_Cart': self.sync_cart,
+            'Get_Cart': self.get_cart,
+            'place_order': self.place_order,
+            'get_dashboard_stats': self.dashboard_stats,
+        }
+
+    def product_list(self):
+        ordering = self.rng.choice(['name', 'price_asc', 'rating'])
+        return self.customer.get(reverse('ProductDetails'), {'limit': 20, 'fields': 'card', 'ordering': ordering})
+
+    def product_list_anonymous(self):
+        return self.anonymous.get(reverse('ProductDetails'), {'limit': 20, 'fields': 'card'})
+
+    def product_search(self):
+        return self.customer.get(reverse('ProductDetails'), {'search': self.rng.choice(NOUNS).lower(), 'limit': 20})
+
+    def product_detail(self):
+        return self.customer.get(reverse('ProductDetail', args=[self.rng.choice(self.product_ids)]))
+
+    def suggestions(self):
+        return self.customer.get(reverse('SearchSuggestions'), {'q': self.rng.choice(ADJECTIVES + NOUNS)[:3]})
+
+    def sync_cart(self):
+        items = [{'id': str(pk), 'quantity': self.rng.randint(1, 3)} for pk in self.rng.sample(self.product_ids, 3)]
+        return self.customer.post(reverse('SyncCart'), {'items': items}, content_type='application/json')
+
+    def get_cart(self):
+        return self.customer.get(reverse('GetCart'))
+
+    def place_order(self):
+        items = [{'product_id': str(pk), 'quantity': 1} for pk in self.rng.sample(self.product_ids, 2)]
+        return self.customer.post(reverse('place_order'), {
+            'items': items, 'full_name': 'Bench', 'address': '1 Bench Road', 'city': 'Bench', 'zip_code': '00000',
+        }, content_type='application/json')
+
+    def dashboard_stats(self):
+        # The seeded orders end at BASE_DATE
+        return self.owner.get(reverse('dashboard_stats'), {'end': BASE_DATE.date().isoformat()})
+
+
+def measure(call, iterations, warmup):
+    for _ in range(warmup):
+        call()
+    latencies = []
+    queries = []
+    statuses = set()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with track_queries() as stats:
+            request_start = time.perf_counter()
+            response = call()
+            latencies.append((time.perf_counter() - request_start) * 1000)
+        queries.append(stats.count)
+        statuses.add(response.status_code)
+    elapsed = time.perf_counter() - started
+    return {
+        'iterations': iterations,
+        'requests_per_sec': round(iterations / elapsed, 1),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries': round(statistics.mean(queries), 2),
+        'max_queries': max(queries),
+        'statuses': sorted(statuses),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic catalog into a throwaway test database and benchmark the API hot paths '
+        '(latency percentiles, throughput, query counts). Works on SQLite and Postgres.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=25)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--reviews', type=int, default=10000)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--only', help='Comma separated scenario names to run')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Baseline JSON from an earlier --output run')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='With --compare, fail when p50 latency or queries grow by more than this fraction',
+        )
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)
+
+        with benchmark_environment(options['keepdb']):
+            results = self.run(options)
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(f'Wrote {options["output"]}')
+        if baseline is not None:
+            self.compare(baseline, results, options['threshold'])
+
+    def run(self, options):
+        counts = seed_catalog(
+            products=options['products'], categories=options['categories'], users=options['users'],
+            reviews=options['reviews'], orders=options['orders'], seed=options['seed'],
+            stock=10 ** 6,
+        )
+        self.stdout.write('Seeded ' + ', '.join(f'{count} {name}' for name, count in counts.items()))
+
+        users = list(User.objects.filter(profile__isnull=False).select_related('profile').order_by('id')[:2])
+        if len(users) < 2:
+            raise CommandError('Need at least two users (--users 2)')
+        product_ids = list(Product.objects.values_list('pk', flat=True))
+        scenarios = Scenarios(users[0], users[1], product_ids, random.Random(options['seed'])).all()
+        if options['only']:
+            names = [name.strip() for name in options['only'].split(',')]
+            unknown = set(names) - set(scenarios)
+            if unknown:
+                raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+            scenarios = {name: scenarios[name] for name in names}
+
+        self.stdout.write(f'{"scenario":<32} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8}')
+        results = {}
+        for name, call in scenarios.items():
+            result = measure(call, options['iterations'], options['warmup'])
+            results[name] = result
+            self.stdout.write(
+                f'{name:<32} {result["requests_per_sec"]:>8} {result["p50_ms"]:>8} {result["p95_ms"]:>8} '
+                f'{result["p99_ms"]:>8} {result["queries"]:>8}'
+            )
+        return {
+            'environment': {
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'dataset': dict(counts, seed=options['seed']),
+            'results': results,
+        }
+
+    def compare(self, baseline, current, threshold):
+        regressions = []
+        for name, result in current['results'].items():
+            before = baseline.get('results', {}).get(name)
+            if before is None:
+                continue
+            for metric in ('p50_ms', 'queries'):
+                if result[metric] > before[metric] * (1 + threshold):
+                    regressions.append(f'{name} {metric}: {before[metric]} -> {result[metric]}')
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
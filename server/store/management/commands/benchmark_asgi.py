@@ -0,0 +1,250 @@
+import asyncio
+import importlib
+import io
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import clear_url_caches, reverse
+
+from core.instrumentation import percentile
+from Flash_Fiesta.api.auth.views import get_tokens_for_user
+from store.models import CartItem, Product
+from store.synthetic import ADJECTIVES, NOUNS, seed_catalog
+
+from .benchmark_api import benchmark_environment
+
+
+@contextmanager
+def api_mode(async_api):
+    """
+    Route the read endpoints to their sync or async views. The choice is
+    made when the URLconf is imported, so reload it both ways.
+    """
+    def reload():
+        importlib.reload(importlib.import_module('Flash_Fiesta.api.product.urls'))
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    try:
+        with override_settings(ASYNC_API=async_api):
+            reload()
+            yield
+    finally:
+        reload()
+
+
+class Requests:
+    """(path, query string) generators for the endpoints that have async views."""
+
+    def __init__(self, product_ids, rng):
+        self.product_ids = product_ids
+        self.rng = rng
+
+    def all(self):
+        return {
+            'ProductView': self.product_list,
+            'ProductDetailView': self.product_detail,
+            'Search_Suggestions': self.suggestions,
+            'Get_Cart': self.get_cart,
+            'List_Wishlist': self.wishlist,
+        }
+
+    def product_list(self):
+        ordering = self.rng.choice(['name', 'price_asc', 'rating'])
+        return reverse('ProductDetails'), urlencode({'limit': 20, 'fields': 'card', 'ordering': ordering})
+
+    def product_detail(self):
+        return reverse('ProductDetail', args=[self.rng.choice(self.product_ids)]), ''
+
+    def suggestions(self):
+        return reverse('SearchSuggestions'), urlencode({'q': self.rng.choice(ADJECTIVES + NOUNS)[:3]})
+
+    def get_cart(self):
+        return reverse('GetCart'), ''
+
+    def wishlist(self):
+        return reverse('ListWishlist'), urlencode({'fields': 'card'})
+
+
+def wsgi_get(application, path, query, token):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': f'Bearer {token}',
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    statuses = []
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(int(status[:3])))
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return statuses[0]
+
+
+async def asgi_get(application, path, query, token):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return messages[0]['status']
+
+
+def run_wsgi(next_request, token, concurrency, total):
+    """total requests through WSGIHandler from `concurrency` threads, as a threaded server would."""
+    # Not get_wsgi_application(): django.setup() would reconfigure logging
+    application = WSGIHandler()
+    latencies, statuses = [], set()
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker():
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+                path, query = next_request()
+            start = time.perf_counter()
+            status = wsgi_get(application, path, query, token)
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses.add(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def run_asgi(next_request, token, concurrency, total):
+    """total requests through ASGIHandler from `concurrency` tasks on one event loop, as uvicorn would."""
+    application = ASGIHandler()
+    latencies, statuses = [], set()
+    remaining = [total]
+
+    async def worker():
+        while remaining[0]:
+            remaining[0] -= 1
+            path, query = next_request()
+            start = time.perf_counter()
+            statuses.add(await asgi_get(application, path, query, token))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return latencies, statuses, time.perf_counter() - started
+
+
+def summarize(latencies, statuses, elapsed):
+    return {
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'statuses': sorted(statuses),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync views under WSGI with the async views under ASGI at several '
+        'concurrency levels, in process, over a seeded synthetic catalog in a throwaway '
+        'test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--reviews', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--concurrency', default='1,8,32', help='Comma separated concurrency levels')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per scenario and level')
+        parser.add_argument('--only', help='Comma separated scenario names to run')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        with benchmark_environment(options['keepdb']):
+            results = self.run(options, levels)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(f'Wrote {options["output"]}')
+
+    def run(self, options, levels):
+        seed_catalog(
+            products=options['products'], users=options['users'], reviews=options['reviews'],
+            orders=options['orders'], carts=1.0, wishlists=1.0, seed=options['seed'],
+        )
+        customer = User.objects.filter(profile__isnull=False, cart_items__isnull=False).order_by('id').first()
+        if customer is None:
+            raise CommandError('The seeded catalog has no customer with a cart')
+        token = get_tokens_for_user(customer)['access']
+        product_ids = list(Product.objects.values_list('pk', flat=True))
+        requests = Requests(product_ids, random.Random(options['seed'])).all()
+        if options['only']:
+            names = [name.strip() for name in options['only'].split(',')]
+            unknown = set(names) - set(requests)
+            if unknown:
+                raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+            requests = {name: requests[name] for name in names}
+        self.stdout.write(
+            f'{customer.username}: {CartItem.objects.filter(user=customer).count()} cart items, '
+            f'{customer.profile.wishlist.count()} wishlisted'
+        )
+
+        self.stdout.write(
+            f'{"scenario":<20} {"conc":>5} {"wsgi req/s":>11} {"asgi req/s":>11} '
+            f'{"wsgi p95":>9} {"asgi p95":>9}'
+        )
+        results = {}
+        for name, next_request in requests.items():
+            results[name] = {}
+            for level in levels:
+                row = {}
+                for mode, runner in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+                    with api_mode(async_api=mode == 'asgi'):
+                        # Warm up: connections, the suggestion index, the user cache
+                        runner(next_request, token, level, level)
+                        row[mode] = summarize(*runner(next_request, token, level, options['requests']))
+                results[name][level] = row
+                self.stdout.write(
+                    f'{name:<20} {level:>5} {row["wsgi"]["requests_per_sec"]:>11} {row["asgi"]["requests_per_sec"]:>11} '
+                    f'{row["wsgi"]["p95_ms"]:>9} {row["asgi"]["p95_ms"]:>9}'
+                )
+        return {'database': settings.DATABASES['default']['ENGINE'], 'results': results}
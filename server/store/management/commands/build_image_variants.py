@@ -0,0 +1,32 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from store.images import IMAGE_FIELDS, build_derivatives, needs_derivatives
+from store.tasks import LOW
+
+
+class Command(BaseCommand):
+    help = (
+        'Queue resized WebP/AVIF/JPEG derivatives for images that have none yet, '
+        'e.g. after an import or for uploads from before store.images.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--now', action='store_true', help='Build them in this process instead of queueing')
+        parser.add_argument('--force', action='store_true', help='Rebuild images that already have derivatives')
+
+    def handle(self, *args, **options):
+        count = 0
+        for label, (image_field, manifest_field) in IMAGE_FIELDS.items():
+            rows = apps.get_model(label).objects.values_list('pk', image_field, manifest_field)
+            for pk, name, manifest in rows.iterator(chunk_size=2000):
+                if not name or not (options['force'] or needs_derivatives(name, manifest)):
+                    continue
+                if options['now']:
+                    build_derivatives(label=label, pk=str(pk), name=name)
+                else:
+                    # Behind uploads waiting in the queue
+                    build_derivatives.enqueue(priority=LOW, label=label, pk=str(pk), name=name)
+                count += 1
+        action = 'Built' if options['now'] else 'Queued'
+        self.stdout.write(self.style.SUCCESS(f'{action} derivatives for {count} images'))
@@ -0,0 +1,104 @@
+import re
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from Flash_Fiesta.api.product.functions import PRODUCT_ORDERINGS, product_page, product_queryset
+from store.models import CartItem, Order, OrderItem, Product, Review, StockSlot, UserProfile
+
+# Plan lines that read a whole table: Postgres "Seq Scan on t", SQLite "SCAN t"
+# (SQLite index scans read "SCAN t USING [COVERING] INDEX ...")
+SEQ_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)(?! USING)\s*$'),
+}
+
+
+def hot_queries():
+    """
+    (name, queryset) for the lookups behind each API endpoint, filled in
+    with existing ids where there are any.
+    """
+    product_id = Product.objects.values_list('pk', flat=True).first() or uuid.uuid4()
+    user_id = UserProfile.objects.values_list('user_id', flat=True).first() or 0
+    profile_id = UserProfile.objects.values_list('pk', flat=True).first() or uuid.uuid4()
+    now = timezone.now()
+
+    def product_list(products, ordering=None):
+        # Built the way ProductView builds its page, so the audit sees its real ORDER BY
+        page, _ = product_page(products, ordering, limit=20)
+        return page
+
+    products = product_queryset()
+    return [
+        *[
+            (f'ProductView ordering={ordering}', product_list(products, ordering))
+            for ordering in PRODUCT_ORDERINGS if ordering != 'relevance'
+        ],
+        ('ProductView trending', product_list(products.filter(is_trending=True))),
+        ('ProductView category', product_list(products.filter(category_id=uuid.uuid4()))),
+        ('ProductDetailView', Product.objects.filter(pk=product_id)),
+        ('Product_Reviews newest', Review.objects.filter(product_id=product_id).order_by('-created_at', '-id')[:21]),
+        ('Product_Reviews highest', Review.objects.filter(product_id=product_id).order_by('-rating', '-created_at', '-id')[:21]),
+        ('Create_Review verified purchase', OrderItem.objects.filter(
+            order__user_id=user_id, product_id=product_id, order__status='Delivered'
+        )),
+        ('can_review flags', OrderItem.objects.filter(
+            order__user_id=user_id, order__status='Delivered', product_id__in=[product_id]
+        ).values('product_id')),
+        ('is_wishlisted flags', UserProfile.wishlist.through.objects.filter(
+            userprofile_id=profile_id, product_id__in=[product_id]
+        ).values('product_id')),
+        ('Get_Cart', CartItem.objects.filter(user_id=user_id).order_by('added_at')),
+        ('get_user_orders', Order.objects.filter(user_id=user_id).order_by('-created_at')),
+        ('get_all_orders', Order.objects.order_by('-created_at')[:50]),
+        ('dashboard hourly series', Order.objects.filter(created_at__gte=now - timedelta(days=1), created_at__lt=now)),
+        ('place_order stock slots', StockSlot.objects.filter(product_id=product_id).order_by('slot')),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the queries behind the API endpoints and report sequential scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not just the flagged ones')
+        parser.add_argument(
+            '--allow-seqscan', action='store_true',
+            help="Postgres: keep enable_seqscan on. By default it is disabled so that small development "
+                 "tables still show whether a usable index exists.",
+        )
+        parser.add_argument('--fail', action='store_true', help='Exit with an error if any scan was found')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        pattern = SEQ_SCAN.get(vendor)
+        if pattern is None:
+            raise CommandError(f'No plan parser for the {vendor} backend')
+
+        flagged = []
+        with transaction.atomic():
+            if vendor == 'postgresql' and not options['allow_seqscan']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            queries = hot_queries()
+            for name, queryset in queries:
+                plan = queryset.explain()
+                tables = [match.group(1) for line in plan.splitlines() if (match := pattern.search(line.strip()))]
+                if tables:
+                    flagged.append(name)
+                    self.stdout.write(self.style.WARNING(f'{name}: sequential scan on {", ".join(tables)}'))
+                else:
+                    self.stdout.write(f'{name}: ok')
+                if tables or options['verbose_plans']:
+                    self.stdout.write(plan + '\n')
+
+        if flagged:
+            message = f'{len(flagged)} of {len(queries)} queries scan a whole table'
+            if options['fail']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No sequential scans'))
@@ -0,0 +1,21 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from store.catalog_io import FORMATS, export_products
+
+
+class Command(BaseCommand):
+    help = 'Stream the product catalog as CSV or JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            sys.stdout.writelines(export_products(options['format']))
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as handle:
+            handle.writelines(export_products(options['format']))
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
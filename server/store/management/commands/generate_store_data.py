@@ -0,0 +1,71 @@
+import time
+from datetime import datetime, time as dt_time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from store.synthetic import seed_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large deterministic synthetic dataset (products, categories, users, reviews, orders, '
+        'carts and wishlists) with Zipf-skewed popularity. Uses COPY on Postgres and batched bulk_create elsewhere.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--reviews', type=int, default=500000)
+        parser.add_argument('--orders', type=int, default=200000)
+        parser.add_argument('--carts', type=float, default=0.3, help='Fraction of users with a cart')
+        parser.add_argument('--wishlists', type=float, default=0.3, help='Fraction of users with a wishlist')
+        parser.add_argument('--days', type=int, default=365, help='Spread timestamps over this many days')
+        parser.add_argument(
+            '--end', help='Last day of the timestamps, YYYY-MM-DD (default 2025-01-01, so runs match; '
+                          'pass today to see the data on the dashboard)',
+        )
+        parser.add_argument('--stock', type=int, default=1000, help='ProductQuantity of every product')
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent for popularity (0 = uniform)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Skip recomputing ratings, sales rollups, search vectors and the suggestion index',
+        )
+
+    def handle(self, *args, **options):
+        end = None
+        if options['end']:
+            try:
+                day = datetime.strptime(options['end'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--end must be formatted as YYYY-MM-DD')
+            end = timezone.make_aware(datetime.combine(day, dt_time.max))
+        started = time.perf_counter()
+        reported = {}
+
+        def progress(table, rows):
+            # One line per ~10% of a table's target; dependent tables
+            # (order items, carts, wishlists) only show in the summary
+            target = options.get(table)
+            if not target:
+                return
+            if rows * 10 // target > reported.get(table, 0) or rows >= target:
+                reported[table] = rows * 10 // target
+                self.stdout.write(f'{table}: {rows} rows ({time.perf_counter() - started:.1f}s)')
+
+        counts = seed_catalog(
+            products=options['products'], categories=options['categories'], users=options['users'],
+            reviews=options['reviews'], orders=options['orders'], carts=options['carts'],
+            wishlists=options['wishlists'], days=options['days'], stock=options['stock'],
+            skew=options['skew'], seed=options['seed'], batch_size=options['batch_size'],
+            rebuild=not options['no_rebuild'], progress=progress, end=end,
+        )
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s): '
+            + ', '.join(f'{rows} {table}' for table, rows in counts.items())
+        ))
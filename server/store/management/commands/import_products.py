@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.catalog_io import BATCH_SIZE, FORMATS, InvalidImport, format_for, import_products
+
+
+class Command(BaseCommand):
+    help = 'Upsert products by ProductID from a CSV or JSON Lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, then csv')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--create-categories', action='store_true', help='Create categories missing by name')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as stream:
+                summary = import_products(
+                    stream,
+                    format=options['format'] or format_for(options['path']),
+                    batch_size=options['batch_size'],
+                    create_categories=options['create_categories'],
+                )
+        except (OSError, InvalidImport) as e:
+            raise CommandError(str(e))
+        for error in summary['errors']:
+            self.stderr.write(f'line {error["line"]}: {error["error"]}')
+        if summary['error_count'] > len(summary['errors']):
+            self.stderr.write(f'... and {summary["error_count"] - len(summary["errors"])} more')
+        self.stdout.write(self.style.SUCCESS(
+            f'{summary["created"]} created, {summary["updated"]} updated, {summary["error_count"]} rejected'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute Product review_count, rating_sum and rating_avg from Review.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('products', nargs='*', help='Product ids to repair (default: all)')
+
+    def handle(self, *args, **options):
+        count = rebuild_ratings(options['products'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings for {count} products'))
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.rollups import rebuild_rollups
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date {value!r}, expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Backfill or rebuild the daily sales rollups from Order and OrderItem.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First local date to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last local date to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start']) if options['start'] else None
+        end = parse_date(options['end']) if options['end'] else None
+        days = rebuild_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollups for {days} days'))
@@ -0,0 +1,56 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from store.tasks import claim, execute, purge, requeue_stale, worker_name
+
+# How often an idle worker looks for stale and old tasks
+HOUSEKEEPING_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background tasks, most urgent first. Start several workers '
+        'for concurrency; each runs one task at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when no task is due instead of polling')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls of an empty queue')
+        parser.add_argument('--max-tasks', type=int, help='Exit after this many tasks (lets a supervisor recycle the process)')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker = worker_name()
+        self.stdout.write(f'Worker {worker} started')
+        done = failed = 0
+        last_housekeeping = 0.0
+        while not self.stopping:
+            if time.monotonic() - last_housekeeping > HOUSEKEEPING_INTERVAL:
+                requeue_stale()
+                purge()
+                last_housekeeping = time.monotonic()
+
+            close_old_connections()
+            task = claim(worker)
+            if task is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+            if execute(task):
+                done += 1
+            else:
+                failed += 1
+            if options['max_tasks'] and done + failed >= options['max_tasks']:
+                break
+        self.stdout.write(f'Worker {worker} stopped: {done} done, {failed} failed')
+
+    def stop(self, signum, frame):
+        # Finish the current task, then exit
+        self.stopping = True
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.inventory import merge_stock, reconcile_stock, shard_stock
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Split hot products\' stock into slots, merge it back, or reconcile ProductQuantity with the slots.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', help='Product UUIDs')
+        parser.add_argument('--slots', type=int, default=8, help='Number of stock slots per product')
+        parser.add_argument('--merge', action='store_true', help='Move slot stock back to ProductQuantity')
+        parser.add_argument('--reconcile', action='store_true', help='Copy slot totals to ProductQuantity')
+
+    def handle(self, *args, **options):
+        product_ids = options['product_ids']
+        if options['reconcile']:
+            count = reconcile_stock(product_ids or None)
+            self.stdout.write(self.style.SUCCESS(f'Reconciled {count} sharded products'))
+            return
+
+        if not product_ids:
+            raise CommandError('Provide at least one product id')
+        if options['slots'] < 1:
+            raise CommandError('--slots must be at least 1')
+
+        for product in Product.objects.filter(id__in=product_ids):
+            if options['merge']:
+                total = merge_stock(product)
+                self.stdout.write(f'{product}: merged {total} units')
+            else:
+                total = shard_stock(product, options['slots'])
+                self.stdout.write(f'{product}: {total} units over {options["slots"]} slots')
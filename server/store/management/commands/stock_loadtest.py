@@ -0,0 +1,65 @@
+import threading
+import time
+
+from django.db import OperationalError, connection, transaction
+from django.core.management.base import BaseCommand
+
+from Flash_Fiesta.api.order.functions import InsufficientStock, decrement_stock, lock_products
+from store.inventory import merge_stock, shard_stock
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Hammer one hot product with concurrent reservations and report throughput per slot count.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slots', default='1,2,4,8,16', help='Comma separated slot counts to compare')
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--reservations', type=int, default=50, help='Reservations per worker')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        per_worker = options['reservations']
+        product = Product.objects.create(
+            ProductName='Load test product',
+            ProductPrice=1,
+            ProductImage='',
+            ProductQuantity=workers * per_worker,
+        )
+        try:
+            self.stdout.write(f'{"slots":>6} {"ok":>6} {"errors":>7} {"seconds":>8} {"per sec":>9}')
+            for slots in [int(value) for value in options['slots'].split(',')]:
+                Product.objects.filter(pk=product.pk).update(ProductQuantity=workers * per_worker)
+                merge_stock(product)
+                shard_stock(product, slots)
+                ok, errors, elapsed = self.run_workers(str(product.pk), workers, per_worker)
+                self.stdout.write(f'{slots:>6} {ok:>6} {errors:>7} {elapsed:>8.2f} {ok / elapsed:>9.1f}')
+        finally:
+            product.delete()
+
+    def run_workers(self, product_id, workers, per_worker):
+        counts = {'ok': 0, 'errors': 0}
+        lock = threading.Lock()
+        start_line = threading.Barrier(workers)
+
+        def work():
+            start_line.wait()
+            for _ in range(per_worker):
+                try:
+                    with transaction.atomic():
+                        products, sharded_ids = lock_products([product_id])
+                        decrement_stock(products, {product_id: 1}, sharded_ids)
+                    result = 'ok'
+                except (InsufficientStock, OperationalError):
+                    result = 'errors'
+                with lock:
+                    counts[result] += 1
+            connection.close()
+
+        threads = [threading.Thread(target=work) for _ in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts['ok'], counts['errors'], time.perf_counter() - started
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.9 on 2026-10-18 14:34
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# GIN indexes and the backfill only apply to Postgres; other backends
+# (SQLite test runs) search through the Python fallback in store.search.
+FORWARD_SQL = [
+    'CREATE INDEX store_product_search_vector_gin ON store_product USING gin (search_vector)',
+    'CREATE INDEX store_product_name_trgm ON store_product USING gin ("ProductName" gin_trgm_ops)',
+    '''
+    UPDATE store_product p SET search_vector =
+        setweight(to_tsvector(COALESCE(p."ProductName", '')), 'A')
+        || setweight(to_tsvector(COALESCE(p."ProductDescription", '')), 'B')
+        || setweight(to_tsvector(COALESCE((SELECT c.name FROM store_category c WHERE c.id = p.category_id), '')), 'C')
+    ''',
+]
+
+REVERSE_SQL = [
+    'DROP INDEX IF EXISTS store_product_name_trgm',
+    'DROP INDEX IF EXISTS store_product_search_vector_gin',
+]
+
+
+def run_postgres_sql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_userprofile_can_manage_categories_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_postgres_sql(FORWARD_SQL), run_postgres_sql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.9 on 2026-10-18 14:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSlot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_slots', to='store.product')),
+            ],
+            options={
+                'unique_together': {('product', 'slot')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.9 on 2026-10-18 14:46
+
+from django.db import migrations, models
+
+
+BACKFILL_SQL = '''
+    UPDATE store_product SET
+        review_count = (SELECT COUNT(*) FROM store_review r WHERE r.product_id = store_product.id),
+        rating_sum = COALESCE((SELECT SUM(r.rating) FROM store_review r WHERE r.product_id = store_product.id), 0),
+        rating_avg = COALESCE((SELECT AVG(r.rating) FROM store_review r WHERE r.product_id = store_product.id), 0)
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
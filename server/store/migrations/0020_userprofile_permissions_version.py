@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-18 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0019_review_rating_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='permissions_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    # Same computation as store.rollups.rebuild_rollups, on the historical
+    # models: the dashboard reads only the rollups, which 0013 left empty
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    DailySalesRollup = apps.get_model('store', 'DailySalesRollup')
+    DailyCategorySales = apps.get_model('store', 'DailyCategorySales')
+
+    days = {
+        row['day']: DailySalesRollup(
+            date=row['day'],
+            orders=row['orders'],
+            revenue=row['revenue'] or 0,
+            cancelled_orders=row['cancelled_orders'],
+            cancelled_revenue=row['cancelled_revenue'] or 0,
+        )
+        for row in Order.objects.annotate(day=TruncDate('created_at')).values('day').annotate(
+            orders=Count('id'),
+            revenue=Sum('total_amount'),
+            cancelled_orders=Count('id', filter=Q(status='Cancelled')),
+            cancelled_revenue=Sum('total_amount', filter=Q(status='Cancelled')),
+        ).order_by()
+    }
+    categories = []
+    items = OrderItem.objects.annotate(day=TruncDate('order__created_at'))
+    for row in items.values('day', 'product__category_id').annotate(
+        units=Sum('quantity'), revenue=Sum(F('quantity') * F('price'))
+    ).order_by():
+        days[row['day']].units += row['units']
+        categories.append(DailyCategorySales(
+            date=row['day'], category_id=row['product__category_id'], units=row['units'], revenue=row['revenue'] or 0
+        ))
+
+    DailySalesRollup.objects.all().delete()
+    DailyCategorySales.objects.all().delete()
+    DailySalesRollup.objects.bulk_create(days.values(), batch_size=1000)
+    DailyCategorySales.objects.bulk_create(categories, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_userprofile_permissions_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
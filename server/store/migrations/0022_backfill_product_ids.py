@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+def assign_product_ids(apps, schema_editor):
+    # Products created in the dashboard had no ProductID, so they exported
+    # with a blank one that the import rejected
+    Product = apps.get_model('store', 'Product')
+    next_id = (Product.objects.aggregate(last=Max('ProductID'))['last'] or 0) + 1
+    for pk in Product.objects.filter(ProductID__isnull=True).order_by('ProductName', 'id').values_list('pk', flat=True):
+        Product.objects.filter(pk=pk).update(ProductID=next_id)
+        next_id += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_backfill_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_product_ids, migrations.RunPython.noop),
+    ]
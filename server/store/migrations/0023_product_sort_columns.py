@@ -0,0 +1,47 @@
+# Generated by Django 4.2.9 on 2026-10-18 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0022_backfill_product_ids'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='store_product_trending',
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='ProductName',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='ProductPrice',
+            field=models.FloatField(blank=True, default=0, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['ProductName', 'id'], name='store_product_name'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_trending', True)), fields=['ProductName', 'id'], name='store_product_trending'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['ProductPrice', 'id'], name='store_product_price'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['rating_avg', 'id'], name='store_product_rating'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['review_count', 'id'], name='store_product_reviews'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.9 on 2026-10-18 15:47
+
+from django.db import migrations, models
+
+
+def mark_counted_orders(apps, schema_editor):
+    # Orders already in the rollups (0021 backfilled them and record_order_sales
+    # added the rest), except those whose task has not run yet
+    Order = apps.get_model('store', 'Order')
+    Task = apps.get_model('store', 'Task')
+    pending = {
+        task.kwargs.get('order_id')
+        for task in Task.objects.filter(name='store.rollups.record_order_sales', status__in=['queued', 'running'])
+    }
+    Order.objects.exclude(pk__in=[pk for pk in pending if pk]).update(rolled_up=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_product_sort_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='rolled_up',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('rolled_up', False)), fields=['created_at'], name='store_order_pending_rollup'),
+        ),
+        migrations.RunPython(mark_counted_orders, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.utils import timezone
 import uuid
 
 class UserProfile(models.Model):
@@ -22,6 +26,9 @@ class UserProfile(models.Model):
     can_manage_products = models.BooleanField(default=True)
     can_manage_categories = models.BooleanField(default=True)
     can_manage_orders = models.BooleanField(default=False)
+    # Bumped when the role or a flag changes; access tokens carry the
+    # version they were issued with (core.permissions)
+    permissions_version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.user.username} - {self.role}"
@@ -35,11 +42,15 @@ class DashBoardSwiper(models.Model):
   name = models.CharField(max_length=255, blank=True,null=True)
   category = models.CharField(max_length=255, blank=True,null=True)
   categoryImage = models.ImageField(upload_to='dashboard')
+  # Resized / re-encoded copies, maintained by store.images
+  image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
 class Category(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     image = models.ImageField(upload_to='categories', blank=True, null=True)
+    # Resized / re-encoded copies, maintained by store.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -48,12 +59,32 @@ class Product(models.Model):
   id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
   ProductID = models.IntegerField(unique=True, blank=True, null=True)
   category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='products')
-  ProductName = models.CharField(max_length=255, blank=True,null=True)
+  # Not null, so ProductView can sort on the plain columns and use their indexes
+  ProductName = models.CharField(max_length=255, blank=True, default='')
   ProductDescription = models.TextField(blank=True,null=True)
-  ProductPrice = models.FloatField(max_length=255, blank=True,null=True)
+  ProductPrice = models.FloatField(max_length=255, blank=True, default=0)
   ProductImage = models.ImageField(upload_to='dashboard') # Primary image
   ProductQuantity = models.IntegerField()
   is_trending = models.BooleanField(default=False)
+  # Maintained by store.search (name, description and category name)
+  search_vector = SearchVectorField(null=True, editable=False)
+  # Maintained by store.ratings as reviews are added and removed
+  review_count = models.PositiveIntegerField(default=0, editable=False)
+  rating_sum = models.PositiveIntegerField(default=0, editable=False)
+  rating_avg = models.FloatField(default=0, editable=False)
+  # Resized / re-encoded copies of ProductImage, maintained by store.images
+  image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+  class Meta:
+    # ProductView's keyset orderings (sort column, then id)
+    indexes = [
+      models.Index(fields=['ProductName', 'id'], name='store_product_name'),
+      # ?trending=true, in the default name order
+      models.Index(fields=['ProductName', 'id'], condition=models.Q(is_trending=True), name='store_product_trending'),
+      models.Index(fields=['ProductPrice', 'id'], name='store_product_price'),
+      models.Index(fields=['rating_avg', 'id'], name='store_product_rating'),
+      models.Index(fields=['review_count', 'id'], name='store_product_reviews'),
+    ]
 
   def __str__(self):
     return self.ProductName
@@ -62,6 +93,8 @@ class ProductImageGallery(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='gallery')
     image = models.ImageField(upload_to='product_gallery')
+    # Resized / re-encoded copies, maintained by store.images
+    variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"Image for {self.product.ProductName}"
@@ -70,10 +103,17 @@ class Review(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
-    rating = models.IntegerField(default=5)
+    rating = models.IntegerField(default=5, validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Keyset pagination of a product's reviews (newest / by rating)
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='store_review_product_created'),
+            models.Index(fields=['product', 'rating', 'created_at'], name='store_review_product_rating'),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s review for {self.product.ProductName}"
 
@@ -87,6 +127,19 @@ class Order(models.Model):
     total_amount = models.FloatField(blank=True,null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default='Pending')
+    # Set once the order is counted in the daily rollups (store.rollups)
+    rolled_up = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [
+            # get_user_orders, and the verified-purchase check (user, Delivered)
+            models.Index(fields=['user', 'created_at'], name='store_order_user_created'),
+            models.Index(fields=['user', 'status'], name='store_order_user_status'),
+            # get_all_orders and the hourly dashboard series
+            models.Index(fields=['created_at'], name='store_order_created'),
+            # Orders the dashboard still aggregates live
+            models.Index(fields=['created_at'], condition=models.Q(rolled_up=False), name='store_order_pending_rollup'),
+        ]
 
 class OrderItem(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -95,6 +148,11 @@ class OrderItem(models.Model):
     quantity = models.IntegerField()
     price = models.FloatField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'order'], name='store_orderitem_product_order'),
+        ]
+
 class CartItem(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='cart_items')
@@ -103,4 +161,80 @@ class CartItem(models.Model):
     added_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('user', 'product')
\ No newline at end of file
+        unique_together = ('user', 'product')
+        indexes = [
+            # Get_Cart reads a user's items in the order they were added
+            models.Index(fields=['user', 'added_at'], name='store_cartitem_user_added'),
+        ]
+
+class StockSlot(models.Model):
+    # Stock of a hot product split over several rows so concurrent
+    # checkouts lock different rows; see store.inventory.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_slots')
+    slot = models.PositiveSmallIntegerField()
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('product', 'slot')
+
+
+class DailySalesRollup(models.Model):
+    # Pre-aggregated order totals per local day; maintained by store.rollups
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.FloatField(default=0)
+    units = models.IntegerField(default=0)
+    cancelled_orders = models.IntegerField(default=0)
+    cancelled_revenue = models.FloatField(default=0)
+
+
+class DailyCategorySales(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    units = models.IntegerField(default=0)
+    revenue = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'category')
+
+
+class Task(models.Model):
+    # A queued background job; see store.tasks
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the most urgent due task
+            models.Index(
+                fields=['-priority', 'run_at'], condition=models.Q(status='queued'), name='store_task_due',
+            ),
+            models.Index(fields=['status', 'locked_at'], name='store_task_status_locked'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
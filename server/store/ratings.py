@@ -0,0 +1,44 @@
+from django.db.models import Avg, Count, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .models import Product, Review
+
+
+def average(rating_sum, review_count):
+    return Coalesce(
+        Cast(rating_sum, FloatField()) / NullIf(Cast(review_count, FloatField()), Value(0.0)),
+        Value(0.0),
+    )
+
+
+def apply_rating(product_id, rating, count=1):
+    """
+    Add (count=1) or remove (count=-1) one rating with a single UPDATE. The
+    right-hand side reads the row's current values, so concurrent reviews
+    never lose an increment.
+    """
+    review_count = F('review_count') + count
+    rating_sum = F('rating_sum') + count * rating
+    return Product.objects.filter(pk=product_id).update(
+        review_count=review_count,
+        rating_sum=rating_sum,
+        rating_avg=average(rating_sum, review_count),
+    )
+
+
+def rebuild_ratings(product_ids=None):
+    """
+    Recompute the rating aggregates from Review in one UPDATE. Returns the
+    number of products written.
+    """
+    reviews = Review.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    review_count = Coalesce(Subquery(reviews.annotate(n=Count('id')).values('n')), 0)
+    rating_sum = Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0)
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    return products.update(
+        review_count=review_count,
+        rating_sum=rating_sum,
+        rating_avg=Coalesce(Subquery(reviews.annotate(avg=Avg('rating')).values('avg')), 0.0),
+    )
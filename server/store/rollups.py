@@ -0,0 +1,152 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyCategorySales, DailySalesRollup, Order, OrderItem
+from .tasks import task
+
+CANCELLED = 'Cancelled'
+
+
+def increment(model, lookup, **deltas):
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another request created the row first
+        model.objects.filter(**lookup).update(**updates)
+
+
+def record_order(order, lines):
+    """
+    Add a placed order to the rollups. lines is an iterable of
+    (category_id, quantity, unit price). Checkout goes through
+    record_order_sales so the increments never hold locks inside the
+    checkout transaction.
+    """
+    date = timezone.localdate(order.created_at)
+    units = 0
+    by_category = defaultdict(lambda: [0, 0.0])
+    for category_id, qty, price in lines:
+        units += qty
+        by_category[category_id][0] += qty
+        by_category[category_id][1] += qty * price
+
+    total = order.total_amount or 0
+    # Cancelled before it was counted: record_status_change skipped it
+    cancelled = order.status == CANCELLED
+    # The day row first: while it is locked, nothing else writes the day
+    increment(
+        DailySalesRollup, {'date': date}, orders=1, revenue=total, units=units,
+        cancelled_orders=int(cancelled), cancelled_revenue=total if cancelled else 0,
+    )
+    for category_id, (category_units, revenue) in by_category.items():
+        increment(DailyCategorySales, {'date': date, 'category_id': category_id}, units=category_units, revenue=revenue)
+
+
+@task()
+def record_order_sales(order_id):
+    # Locks are always taken order row first, then the day (see
+    # rebuild_rollups); claiming the order also keeps it from being counted
+    # twice when a rebuild already covered it
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order_id, rolled_up=False).update(rolled_up=True):
+            return
+        order = Order.objects.get(pk=order_id)
+        lines = OrderItem.objects.filter(order=order).values_list('product__category_id', 'quantity', 'price')
+        record_order(order, lines)
+
+
+def record_status_change(order, old_status):
+    """Call with the order row locked, after saving its new status."""
+    if not order.rolled_up or (old_status == CANCELLED) == (order.status == CANCELLED):
+        return
+    sign = 1 if order.status == CANCELLED else -1
+    increment(
+        DailySalesRollup,
+        {'date': timezone.localdate(order.created_at)},
+        cancelled_orders=sign,
+        cancelled_revenue=sign * (order.total_amount or 0),
+    )
+
+
+def local_day_bounds(start, end):
+    # Aware [start 00:00, the day after end 00:00) in the current time zone
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def rebuild_rollups(start=None, end=None):
+    """
+    Recompute the rollups from Order/OrderItem for local dates in
+    [start, end] (both optional; by default from the first order through
+    today). Returns the number of days with orders.
+
+    Safe beside checkouts and workers. Orders in the range are marked
+    rolled up first, so their queued record_order_sales tasks skip them.
+    Then every day row in the range is locked before the orders are
+    counted: increments already running finish first and are counted,
+    later ones wait and land on the rebuilt rows.
+    """
+    today = timezone.localdate()
+    with transaction.atomic():
+        if start is None or end is None:
+            first, last = Order.objects.aggregate(first=Min('created_at'), last=Max('created_at')).values()
+            start = start or (timezone.localdate(first) if first else today)
+            end = end or max(timezone.localdate(last) if last else today, today)
+        low, high = local_day_bounds(start, end)
+        in_range = Order.objects.filter(created_at__gte=low, created_at__lt=high)
+        in_range.filter(rolled_up=False).update(rolled_up=True)
+
+        dates = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+        DailySalesRollup.objects.bulk_create(
+            [DailySalesRollup(date=date) for date in dates], ignore_conflicts=True, batch_size=1000
+        )
+        rollups = list(DailySalesRollup.objects.select_for_update().filter(date__gte=start, date__lte=end))
+
+        # Orders claimed by a task that has not committed yet are not visible
+        # here; that task adds them once the locks are released
+        counted = in_range.filter(rolled_up=True)
+        days = {
+            row['day']: row
+            for row in counted.annotate(day=TruncDate('created_at')).values('day').annotate(
+                orders=Count('id'),
+                revenue=Sum('total_amount'),
+                cancelled_orders=Count('id', filter=Q(status=CANCELLED)),
+                cancelled_revenue=Sum('total_amount', filter=Q(status=CANCELLED)),
+            ).order_by()
+        }
+        units = defaultdict(int)
+        categories = []
+        items = OrderItem.objects.filter(order__in=counted).annotate(day=TruncDate('order__created_at'))
+        for row in items.values('day', 'product__category_id').annotate(
+            units=Sum('quantity'), revenue=Sum(F('quantity') * F('price'))
+        ).order_by():
+            units[row['day']] += row['units']
+            categories.append(DailyCategorySales(
+                date=row['day'], category_id=row['product__category_id'], units=row['units'], revenue=row['revenue'] or 0
+            ))
+
+        for rollup in rollups:
+            row = days.get(rollup.date, {})
+            rollup.orders = row.get('orders', 0)
+            rollup.revenue = row.get('revenue') or 0
+            rollup.units = units[rollup.date]
+            rollup.cancelled_orders = row.get('cancelled_orders', 0)
+            rollup.cancelled_revenue = row.get('cancelled_revenue') or 0
+        DailySalesRollup.objects.bulk_update(
+            rollups, ['orders', 'revenue', 'units', 'cancelled_orders', 'cancelled_revenue'], batch_size=1000
+        )
+        DailyCategorySales.objects.filter(date__gte=start, date__lte=end).delete()
+        DailyCategorySales.objects.bulk_create(categories, batch_size=1000)
+    return len(days)
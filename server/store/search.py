@@ -0,0 +1,102 @@
+import difflib
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Category, Product
+
+FUZZY_THRESHOLD = 0.8
+
+# Python fallback weights, mirroring the A/B/C weights of the tsvector
+FIELD_WEIGHTS = {'name': 1.0, 'description': 0.4, 'category': 0.2}
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def product_search_vector():
+    category_name = Subquery(Category.objects.filter(id=OuterRef('category_id')).values('name')[:1])
+    return (
+        SearchVector('ProductName', weight='A')
+        + SearchVector('ProductDescription', weight='B')
+        + SearchVector(category_name, weight='C')
+    )
+
+
+def update_search_vectors(product_ids=None, category_id=None):
+    # The vector is only stored on Postgres; other backends use the
+    # Python fallback in search_products and need no maintenance.
+    if not is_postgres():
+        return
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    if category_id is not None:
+        products = products.filter(category_id=category_id)
+    products.update(search_vector=product_search_vector())
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def score_text(terms, text, weight):
+    words = tokenize(text)
+    score = 0.0
+    for term in terms:
+        if any(word.startswith(term) for word in words):
+            score += weight
+        elif difflib.get_close_matches(term, words, n=1, cutoff=FUZZY_THRESHOLD):
+            # Typo tolerance, roughly what pg_trgm gives on Postgres
+            score += weight * 0.5
+    return score
+
+
+def python_search_scores(queryset, query):
+    terms = tokenize(query)
+    if not terms:
+        return {}
+    rows = queryset.values_list('id', 'ProductName', 'ProductDescription', 'category__name')
+    scores = {}
+    for pk, name, description, category_name in rows:
+        score = (
+            score_text(terms, name, FIELD_WEIGHTS['name'])
+            + score_text(terms, description, FIELD_WEIGHTS['description'])
+            + score_text(terms, category_name, FIELD_WEIGHTS['category'])
+        )
+        if score:
+            scores[pk] = score / len(terms)
+    return scores
+
+
+def search_products(queryset, query):
+    """
+    Filter queryset to products matching query and annotate a search_rank
+    (higher is better). Uses the GIN indexed search_vector and pg_trgm on
+    Postgres, and an in-Python scorer elsewhere (SQLite test runs).
+    """
+    if is_postgres():
+        search_query = SearchQuery(query, search_type='websearch')
+        return queryset.annotate(
+            search_rank=Greatest(
+                SearchRank(F('search_vector'), search_query),
+                TrigramSimilarity('ProductName', query),
+            )
+        ).filter(
+            Q(search_vector=search_query) | Q(ProductName__trigram_similar=query)
+        )
+
+    scores = python_search_scores(queryset, query)
+    return queryset.filter(id__in=scores).annotate(
+        search_rank=Case(
+            *[When(id=pk, then=Value(score)) for pk, score in scores.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
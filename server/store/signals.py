@@ -0,0 +1,138 @@
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from core.authentication import user_cache
+from core.permissions import granted_permissions, remember_permissions_version
+
+from .autocomplete import suggestion_index
+from .cache import categories_changed, products_changed
+from .catalog_io import next_product_id
+from .images import schedule as schedule_derivatives
+from .models import Category, DashBoardSwiper, Product, ProductImageGallery, Review, UserProfile
+from .ratings import apply_rating, rebuild_ratings
+from .search import update_search_vectors
+
+
+@receiver(pre_save, sender=Product)
+def assign_product_id(sender, instance, raw=False, **kwargs):
+    # Products created in the dashboard or the admin need a ProductID too,
+    # since export and re-import match rows on it
+    if not raw and instance.ProductID is None:
+        instance.ProductID = next_product_id()
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_search_vector(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_search_vectors(product_ids=[instance.pk])
+        suggestion_index.upsert(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_suggestions(sender, instance, **kwargs):
+    suggestion_index.remove(instance.pk)
+
+
+@receiver(post_init, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    # What the product's counters hold for this review once it is saved
+    instance._counted_rating = (instance.product_id, instance.rating)
+
+
+@receiver(post_save, sender=Review)
+def count_review_rating(sender, instance, created, raw=False, **kwargs):
+    # Every saved review is counted here, whether it came from
+    # Create_Review, the admin or the shell
+    if raw:
+        # Fixtures may bring their own counters; recount from the rows
+        rebuild_ratings(product_ids=[instance.product_id])
+    elif created:
+        apply_rating(instance.product_id, instance.rating)
+    elif instance._counted_rating != (instance.product_id, instance.rating):
+        product_id, rating = instance._counted_rating
+        apply_rating(product_id, rating, count=-1)
+        apply_rating(instance.product_id, instance.rating)
+    instance._counted_rating = (instance.product_id, instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    apply_rating(instance.product_id, instance.rating, count=-1)
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_search_vectors(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_search_vectors(category_id=instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_responses(sender, instance, **kwargs):
+    products_changed(instance.pk)
+
+
+@receiver(post_save, sender=ProductImageGallery)
+@receiver(post_delete, sender=ProductImageGallery)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_product_detail_responses(sender, instance, **kwargs):
+    products_changed(instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_responses(sender, instance, **kwargs):
+    categories_changed()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImageGallery)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=DashBoardSwiper)
+def build_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_derivatives(instance)
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_granted_permissions(sender, instance, **kwargs):
+    # Left unknown for partial loads, whose deferred fields would each cost a query
+    deferred = instance.get_deferred_fields()
+    instance._granted_permissions = None if deferred else granted_permissions(instance)
+
+
+@receiver(post_save, sender=UserProfile)
+def refresh_permission_claims(sender, instance, created, raw=False, **kwargs):
+    user_cache.invalidate(instance.user_id)
+    granted = granted_permissions(instance)
+    if not raw and not created and granted != instance._granted_permissions:
+        # Tokens issued with the old version stop being trusted everywhere
+        # Bumped in the permission write's transaction, published once it commits
+        UserProfile.objects.filter(pk=instance.pk).update(permissions_version=F('permissions_version') + 1)
+        instance.refresh_from_db(fields=['permissions_version'])
+        transaction.on_commit(lambda: remember_permissions_version(instance.user_id))
+    instance._granted_permissions = granted
+
+
+@receiver(post_delete, sender=UserProfile)
+def forget_profile_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+if apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+    @receiver(post_save, sender=BlacklistedToken)
+    def forget_blacklisted_user(sender, instance, **kwargs):
+        user_cache.invalidate(instance.token.user_id)
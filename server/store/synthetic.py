@@ -0,0 +1,265 @@
+import bisect
+import io
+import itertools
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import JSONField, Max
+
+from .autocomplete import suggestion_index
+from .models import CartItem, Category, Order, OrderItem, Product, Review, UserProfile
+from .ratings import rebuild_ratings
+from .rollups import rebuild_rollups
+from .search import update_search_vectors
+
+ADJECTIVES = [
+    'Classic', 'Urban', 'Vintage', 'Premium', 'Everyday', 'Compact', 'Wireless', 'Organic',
+    'Deluxe', 'Sporty', 'Slim', 'Rugged', 'Smart', 'Cozy', 'Bright', 'Silent',
+]
+NOUNS = [
+    'Sneaker', 'Runner', 'Backpack', 'Headphones', 'Jacket', 'Watch', 'Lamp', 'Kettle',
+    'Blender', 'Hoodie', 'Sandal', 'Speaker', 'Wallet', 'Bottle', 'Keyboard', 'Blanket',
+]
+ORDER_STATUSES = ['Delivered'] * 6 + ['Pending', 'Shipped', 'Cancelled']
+USERNAME_PREFIX = 'synthetic-'
+# Timestamps count back from here unless seed_catalog is given an end, so
+# the same seed always writes the same rows
+BASE_DATE = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def zipf_sampler(items, rng, skew):
+    """
+    Return a function drawing from items with Zipf-like popularity: the
+    k-th most popular item (ranks shuffled over items) has weight 1/k**skew.
+    skew=0 draws uniformly.
+    """
+    if skew <= 0:
+        return lambda: rng.choice(items)
+    ranked = list(items)
+    rng.shuffle(ranked)
+    cumulative = list(itertools.accumulate(1 / rank ** skew for rank in range(1, len(ranked) + 1)))
+    total = cumulative[-1]
+    return lambda: ranked[bisect.bisect(cumulative, rng.random() * total)]
+
+
+def copy_value(field, value):
+    # CSV for COPY: unquoted empty is NULL, everything else quoted
+    if value is None:
+        return ''
+    if isinstance(field, JSONField):
+        # get_db_prep_save wraps JSON for psycopg2, whose str() is SQL
+        value = json.dumps(field.get_prep_value(value), cls=field.encoder)
+    else:
+        value = field.get_db_prep_save(value, connection)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def insert(model, objs, batch_size):
+    """
+    Insert unsaved instances without the ORM's per-object save path: COPY
+    FROM STDIN on Postgres, executemany elsewhere. Values go in as set on
+    the instances, so auto_now_add fields keep the generator's timestamps.
+    """
+    if not objs:
+        return
+    # Serial primary keys (e.g. the wishlist through table) are left to the database
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not (field.primary_key and getattr(objs[0], field.attname) is None)
+    ]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            for obj in objs:
+                buffer.write(','.join(copy_value(field, getattr(obj, field.attname)) for field in fields))
+                buffer.write('\n')
+            buffer.seek(0)
+            cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+        else:
+            rows = (
+                [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields]
+                for obj in objs
+            )
+            placeholders = ', '.join(['%s'] * len(fields))
+            for batch in batches(rows, batch_size):
+                cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', batch)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def seed_catalog(products=1000, categories=20, users=100, reviews=5000, orders=2000, carts=0.3,
+                 wishlists=0.3, days=90, stock=1000, skew=1.1, seed=0, batch_size=5000,
+                 rebuild=True, progress=None, end=None):
+    """
+    Insert a deterministic synthetic store in batches: categories, products,
+    users (the first one an owner when the database has none yet), reviews,
+    orders with items, carts for a `carts` fraction of users and wishlists
+    for a `wishlists` fraction. Product and customer popularity follow a
+    Zipf distribution with exponent `skew`; timestamps spread over the
+    `days` days before `end` (BASE_DATE by default). Running it again adds
+    to the existing rows. Derived data (ratings, sales rollups, search
+    vectors, the suggestion index) is rebuilt afterwards unless
+    rebuild=False. Returns the row counts; progress(table, rows) is called
+    after each batch.
+    """
+    rng = random.Random(seed)
+    # Product ids and usernames continue after the rows already there
+    start = (Product.objects.aggregate(last=Max('ProductID'))['last'] or 0) + 1
+    taken = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+    # Primary keys come from their own stream, so they don't shift the data.
+    # It depends on what is already there, so a second run with the same
+    # seed does not repeat the first run's keys.
+    id_rng = random.Random(f'{seed}:ids:{Category.objects.count()}:{start}:{taken}')
+    end = end or BASE_DATE
+    counts = dict.fromkeys(
+        ['categories', 'products', 'users', 'reviews', 'orders', 'order_items', 'cart_items', 'wishlist_items'], 0
+    )
+
+    def written(table, objs):
+        counts[table] += len(objs)
+        if progress:
+            progress(table, counts[table])
+
+    def moment():
+        return end - timedelta(seconds=rng.randint(0, days * 86400))
+
+    def new_id():
+        return uuid.UUID(int=id_rng.getrandbits(128), version=4)
+
+    def picks(draw, count):
+        # Distinct draws in the order drawn
+        return list(dict.fromkeys(draw() for _ in range(count)))
+
+    category_rows = [
+        Category(id=new_id(), name=f'{NOUNS[index % len(NOUNS)]}s {index + 1}') for index in range(categories)
+    ]
+    insert(Category, category_rows, batch_size)
+    written('categories', category_rows)
+
+    # Only ids and prices are kept in memory for the later tables
+    prices = {}
+    for batch in batches(range(start, start + products), batch_size):
+        rows = [
+            Product(
+                id=new_id(),
+                ProductID=product_id,
+                ProductName=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {product_id}',
+                ProductDescription=f'{rng.choice(ADJECTIVES).lower()} {rng.choice(NOUNS).lower()} for every day',
+                ProductPrice=round(rng.uniform(5, 500), 2),
+                ProductImage='dashboard/synthetic.jpg',
+                ProductQuantity=stock,
+                category=rng.choice(category_rows) if category_rows else None,
+                is_trending=rng.random() < 0.1,
+            )
+            for product_id in batch
+        ]
+        insert(Product, rows, batch_size)
+        prices.update((row.pk, row.ProductPrice) for row in rows)
+        written('products', rows)
+
+    # Users go through bulk_create, which returns their serial ids. One
+    # password hash serves every account; hashing per user would dominate.
+    password = make_password('synthetic')
+    has_owner = UserProfile.objects.filter(role='OWNER').exists()
+    user_ids = []
+    profile_ids = []
+    for batch in batches(range(taken, taken + users), batch_size):
+        rows = User.objects.bulk_create(
+            [User(username=f'{USERNAME_PREFIX}{index}', password=password, date_joined=moment()) for index in batch]
+        )
+        profiles = [
+            UserProfile(
+                id=new_id(),
+                user_id=user.pk,
+                role='OWNER' if not has_owner and not user_ids and position == 0 else 'CUSTOMER',
+                can_view_stats=not has_owner and not user_ids and position == 0,
+            )
+            for position, user in enumerate(rows)
+        ]
+        insert(UserProfile, profiles, batch_size)
+        user_ids.extend(user.pk for user in rows)
+        profile_ids.extend(profile.pk for profile in profiles)
+        written('users', rows)
+
+    if prices and user_ids:
+        popular_product = zipf_sampler(list(prices), rng, skew)
+        active_user = zipf_sampler(user_ids, rng, skew)
+    else:
+        # Nothing to attach reviews, orders, carts or wishlists to
+        reviews = orders = 0
+        carts = wishlists = 0
+
+    for batch in batches(range(reviews), batch_size):
+        rows = [
+            Review(
+                id=new_id(),
+                product_id=popular_product(),
+                user_id=active_user(),
+                rating=rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 2, 4, 4])[0],
+                comment='Synthetic review',
+                created_at=moment(),
+            )
+            for _ in batch
+        ]
+        insert(Review, rows, batch_size)
+        written('reviews', rows)
+
+    for batch in batches(range(orders), batch_size):
+        order_rows = []
+        item_rows = []
+        for _ in batch:
+            order = Order(
+                id=new_id(), user_id=active_user(), full_name='Synthetic Customer', address='1 Test Street',
+                city='Testville', zip_code='00000', status=rng.choice(ORDER_STATUSES), total_amount=0,
+                created_at=moment(),
+            )
+            for product_id in picks(popular_product, rng.randint(1, 4)):
+                quantity = rng.randint(1, 3)
+                item_rows.append(OrderItem(
+                    id=new_id(), order=order, product_id=product_id, quantity=quantity, price=prices[product_id],
+                ))
+                order.total_amount += quantity * prices[product_id]
+            order_rows.append(order)
+        with transaction.atomic():
+            insert(Order, order_rows, batch_size)
+            insert(OrderItem, item_rows, batch_size)
+        written('orders', order_rows)
+        written('order_items', item_rows)
+
+    shoppers = rng.sample(user_ids, int(len(user_ids) * carts))
+    for batch in batches(shoppers, batch_size):
+        rows = [
+            CartItem(id=new_id(), user_id=user_id, product_id=product_id, quantity=rng.randint(1, 3), added_at=moment())
+            for user_id in batch
+            for product_id in picks(popular_product, rng.randint(1, 5))
+        ]
+        insert(CartItem, rows, batch_size)
+        written('cart_items', rows)
+
+    Wishlist = UserProfile.wishlist.through
+    for batch in batches(rng.sample(profile_ids, int(len(profile_ids) * wishlists)), batch_size):
+        rows = [
+            Wishlist(userprofile_id=profile_id, product_id=product_id)
+            for profile_id in batch
+            for product_id in picks(popular_product, rng.randint(1, 10))
+        ]
+        insert(Wishlist, rows, batch_size)
+        written('wishlist_items', rows)
+
+    if rebuild:
+        rebuild_ratings()
+        rebuild_rollups()
+        update_search_vectors()
+        suggestion_index.build()
+    return counts
@@ -0,0 +1,167 @@
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger('flashfiesta.tasks')
+
+HIGH = 10
+NORMAL = 0
+LOW = -10
+
+registry = {}
+
+
+class TaskFunction:
+    """
+    A function that can also be queued. Calling it runs it inline;
+    enqueue() stores a Task row that a run_tasks worker picks up.
+    """
+
+    def __init__(self, func, priority, max_attempts, retry_delay):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.__doc__ = func.__doc__
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, priority=None, delay=0, **kwargs):
+        """
+        Queue a call with JSON-serializable kwargs. The row is written in the
+        caller's transaction, so the task exists exactly when the change
+        that asked for it commits. With TASKS_EAGER it runs on commit instead.
+        """
+        if getattr(settings, 'TASKS_EAGER', False):
+            transaction.on_commit(lambda: self.func(**kwargs))
+            return None
+        return Task.objects.create(
+            name=self.name,
+            kwargs=kwargs,
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+
+def task(priority=NORMAL, max_attempts=3, retry_delay=30):
+    """Register a function as a background task: @task(priority=HIGH)."""
+    def register(func):
+        task_function = TaskFunction(func, priority, max_attempts, retry_delay)
+        registry[task_function.name] = task_function
+        return task_function
+    return register
+
+
+def resolve(name):
+    # Importing the module registers the tasks it defines
+    if name not in registry:
+        import_string(name)
+    return registry[name]
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """Lock the most urgent due task for this worker, or return None."""
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = (
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status=Task.QUEUED, run_at__lte=now)
+            .order_by('-priority', 'run_at')
+        )
+        task = candidates.first()
+        if task is None:
+            return None
+        # The status check keeps two workers from taking the same row on
+        # databases without row locks (SQLite)
+        claimed = Task.objects.filter(pk=task.pk, status=Task.QUEUED).update(
+            status=Task.RUNNING, attempts=task.attempts + 1, locked_by=worker, locked_at=now,
+        )
+    if not claimed:
+        return None
+    task.status, task.attempts, task.locked_by, task.locked_at = Task.RUNNING, task.attempts + 1, worker, now
+    return task
+
+
+class LeaseLost(Exception):
+    """The task was requeued (see requeue_stale) while this attempt ran."""
+
+
+def held(task):
+    # Still this attempt's: not requeued and claimed again meanwhile
+    return Task.objects.filter(pk=task.pk, status=Task.RUNNING, locked_by=task.locked_by, locked_at=task.locked_at)
+
+
+def execute(task):
+    """
+    Run a claimed task. Its work and the done marker commit together, so a
+    failed or interrupted attempt leaves no database changes behind, and
+    neither does one that outlived its lease: the marker only lands while
+    this attempt still holds the task. Failed attempts are retried with
+    exponential backoff until max_attempts.
+    """
+    try:
+        task_function = resolve(task.name)
+        with transaction.atomic():
+            task_function.func(**task.kwargs)
+            if not held(task).update(status=Task.DONE, finished_at=timezone.now(), last_error=''):
+                raise LeaseLost
+        return True
+    except LeaseLost:
+        logger.warning('Task %s %s ran past its lease; its work was rolled back', task.name, task.pk)
+        return False
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if task.attempts < task.max_attempts:
+            retry_delay = registry[task.name].retry_delay if task.name in registry else 30
+            delay = timedelta(seconds=retry_delay * 2 ** (task.attempts - 1))
+            held(task).update(
+                status=Task.QUEUED, run_at=now + delay, locked_by='', locked_at=None, last_error=error,
+            )
+            logger.warning('Task %s %s failed (attempt %s), retrying in %s', task.name, task.pk, task.attempts, delay)
+        else:
+            held(task).update(status=Task.FAILED, finished_at=now, last_error=error)
+            logger.error('Task %s %s failed after %s attempts\n%s', task.name, task.pk, task.attempts, error)
+        return False
+
+
+def requeue_stale(timeout=None):
+    """
+    Put back tasks whose worker died mid-run, or fail them once they have
+    used their attempts (a task that kills its worker would otherwise come
+    back forever). Returns how many were requeued.
+    """
+    timeout = timeout or settings.TASK_LEASE_TIMEOUT
+    now = timezone.now()
+    stale = Task.objects.filter(status=Task.RUNNING, locked_at__lt=now - timeout)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, finished_at=now, locked_by='', locked_at=None,
+        last_error=f'Still running after {timeout} on its last attempt; its worker was probably lost',
+    )
+    if failed:
+        logger.error('Failed %s tasks that outlived their lease on their last attempt', failed)
+    return stale.filter(attempts__lt=F('max_attempts')).update(status=Task.QUEUED, locked_by='', locked_at=None)
+
+
+def purge(older_than=None):
+    """Delete finished tasks older than TASK_RETENTION; failed ones are kept."""
+    older_than = older_than or settings.TASK_RETENTION
+    deleted, _ = Task.objects.filter(status=Task.DONE, finished_at__lt=timezone.now() - older_than).delete()
+    return deleted
@@ -1,3 +1,335 @@
-from django.test import TestCase
+import io
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import user_cache
+from core.events import RESYNC, LocalBroker, get_broker
+from Flash_Fiesta.api.auth.views import get_tokens_for_user
+from Flash_Fiesta.api.order.async_views import can_manage_orders, event_stream
+from store.analytics import dashboard_totals
+from store.catalog_io import export_products, import_products
+from store.events import STOCK, STOCK_EVENT_SIZE, stock_changed
+from store.inventory import current_stock, reserve_stock, shard_stock
+from store.models import CartItem, DailySalesRollup, Order, Product, UserProfile
+from store.rollups import CANCELLED, rebuild_rollups
+from store.synthetic import seed_catalog
+from store.tasks import claim, execute
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-responses'},
+}
+
+
+class CacheTestCase(TestCase):
+    def setUp(self):
+        # User ids repeat between tests; so would their cached rows and
+        # permission versions
+        for cache in caches.all():
+            cache.clear()
+        user_cache.clear()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, CACHES=LOCAL_CACHES)
+class QueryBudgetTests(CacheTestCase):
+    """
+    Every endpoint in QUERY_BUDGETS, requested by a signed-in user so the
+    response cache is bypassed. With QUERY_BUDGET_STRICT the metrics
+    middleware raises QueryBudgetExceeded for a request over its budget.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(products=40, categories=4, users=8, reviews=80, orders=30, carts=1.0, wishlists=1.0)
+        cls.owner = UserProfile.objects.get(role='OWNER').user
+        cls.customer = UserProfile.objects.exclude(role='OWNER').filter(user__cart_items__isnull=False).first().user
+        cls.product = Product.objects.order_by('ProductID').first()
+
+    def request(self, user, method, url, data=None):
+        headers = {'Authorization': f'Bearer {get_tokens_for_user(user)["access"]}'}
+        if method == 'post':
+            return self.client.post(url, data, content_type='application/json', headers=headers)
+        return self.client.get(url, data, headers=headers)
+
+    def requests(self):
+        product = str(self.product.pk)
+        cart = [
+            {'id': str(pk), 'quantity': quantity}
+            for pk, quantity in CartItem.objects.filter(user=self.customer).values_list('product_id', 'quantity')
+        ]
+        order = {
+            'items': [{'product_id': product, 'quantity': 1}],
+            'full_name': 'Test Customer', 'address': '1 Main St', 'city': 'Springfield', 'zip_code': '12345',
+        }
+        return {
+            'ProductDetails': (self.customer, 'get', reverse('ProductDetails'), {'limit': 20}),
+            'ProductDetail': (self.customer, 'get', reverse('ProductDetail', args=[product]), None),
+            'ProductReviews': (self.customer, 'get', reverse('ProductReviews', args=[product]), None),
+            'ListCategories': (self.customer, 'get', reverse('ListCategories'), None),
+            'SearchSuggestions': (self.customer, 'get', reverse('SearchSuggestions'), {'q': self.product.ProductName[:3]}),
+            'ListWishlist': (self.customer, 'get', reverse('ListWishlist'), None),
+            'GetCart': (self.customer, 'get', reverse('GetCart'), None),
+            'SyncCart': (self.customer, 'post', reverse('SyncCart'), {'items': cart[1:]}),
+            'place_order': (self.customer, 'post', reverse('place_order'), order),
+            'user_orders': (self.customer, 'get', reverse('user_orders'), None),
+            'all_orders': (self.owner, 'get', reverse('all_orders'), None),
+            'dashboard_stats': (self.owner, 'get', reverse('dashboard_stats'), None),
+        }
+
+    def test_every_budget_is_exercised(self):
+        self.assertEqual(set(self.requests()), set(settings.QUERY_BUDGETS))
+
+    def test_endpoints_stay_within_budget(self):
+        for name, (user, method, url, data) in self.requests().items():
+            with self.subTest(name):
+                response = self.request(user, method, url, data)
+                self.assertLess(response.status_code, 300, response.content)
+                self.assertEqual(response.json()['Status'], 6000, response.content)
+
+
+@override_settings(EVENT_BROKER='core.events.LocalBroker', CACHES=LOCAL_CACHES)
+class EventTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = Product.objects.bulk_create([
+            Product(ProductName=f'Product {number}', ProductQuantity=number, ProductImage='')
+            for number in range(STOCK_EVENT_SIZE + 20)
+        ])
+        cls.manager = User.objects.create_user('manager', password='password')
+        UserProfile.objects.create(user=cls.manager, role='EMPLOYEE', can_manage_orders=True)
+
+    def change_stock(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            stock_changed(*(product.pk for product in self.products))
+        return callbacks
+
+    def revoke_manager(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.manager.profile.can_manage_orders = False
+            self.manager.profile.save()
+
+    async def test_stock_is_published_on_commit_in_parts(self):
+        subscription = get_broker().subscribe({STOCK})
+        callbacks = await sync_to_async(self.change_stock)()
+        self.assertIsNone(await subscription.get(0.05))
+
+        for callback in callbacks:
+            await sync_to_async(callback)()
+        levels = {}
+        while (event := await subscription.get(0.05)) is not None:
+            self.assertLessEqual(len(event['data']['products']), STOCK_EVENT_SIZE)
+            levels.update(event['data']['products'])
+        self.assertEqual(levels, {str(product.pk): product.ProductQuantity for product in self.products})
+
+    async def test_reconnect_replays_missed_events(self):
+        broker = LocalBroker(history=10)
+        first = broker.subscribe({'orders'})
+        broker.publish('orders', 'order.created', {'number': 1})
+        seen = await first.get(1)
+        first.close()
+        broker.publish('orders', 'order.status', {'number': 2})
+        broker.publish('stock', 'stock', {'products': {}})
+        broker.publish('orders', 'order.status', {'number': 3})
+
+        again = broker.subscribe({'orders'}, seen['id'])
+        self.assertEqual([(await again.get(1))['data']['number'] for _ in range(2)], [2, 3])
+        self.assertIsNone(await again.get(0.05))
+
+    async def test_resync_when_missed_events_are_gone(self):
+        broker = LocalBroker(history=2)
+        broker.publish('orders', 'order.created', {'number': 1})
+        last_seen = broker.resync_event()['id']
+        for number in range(2, 5):
+            broker.publish('orders', 'order.status', {'number': number})
+
+        for last_event_id in (last_seen, 'restarted-1'):
+            with self.subTest(last_event_id):
+                subscription = broker.subscribe({'orders'}, last_event_id)
+                self.assertEqual((await subscription.get(1))['type'], RESYNC)
+                subscription.close()
+
+    @override_settings(EVENT_PERMISSION_RECHECK=0)
+    async def test_stream_of_every_order_ends_when_permission_is_revoked(self):
+        request = RequestFactory().get('/')
+        request.user = self.manager
+        request.auth = AccessToken((await sync_to_async(get_tokens_for_user)(self.manager))['access'])
+        self.assertTrue(await can_manage_orders(request))
+
+        stream = event_stream(get_broker().subscribe({'orders'}), set(), lambda: can_manage_orders(request))
+        await anext(stream)
+        await sync_to_async(self.revoke_manager)()
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+
+
+def bearer(user):
+    return {'Authorization': f'Bearer {get_tokens_for_user(user)["access"]}'}
+
+
+def create_user(username, role='CUSTOMER'):
+    user = User.objects.create_user(username, password='password')
+    UserProfile.objects.create(user=user, role=role)
+    return user
+
+
+@override_settings(CACHES=LOCAL_CACHES, TASKS_EAGER=False)
+class CheckoutTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = create_user('customer')
+        cls.plain = Product.objects.create(ProductName='Plain', ProductPrice=10, ProductQuantity=3, ProductImage='')
+        cls.hot = Product.objects.create(ProductName='Hot', ProductPrice=5, ProductQuantity=5, ProductImage='')
+        shard_stock(cls.hot, 4)
+
+    def order(self, product, quantity):
+        data = {
+            'items': [{'product_id': str(product.pk), 'quantity': quantity}],
+            'full_name': 'Test Customer', 'address': '1 Main St', 'city': 'Springfield', 'zip_code': '12345',
+        }
+        return self.client.post(reverse('place_order'), data, content_type='application/json', headers=bearer(self.customer))
+
+    def test_orders_never_take_more_than_the_stock(self):
+        for product, stock in ((self.plain, 3), (self.hot, 5)):
+            with self.subTest(product.ProductName):
+                response = self.order(product, stock + 1)
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertEqual(current_stock([product.pk])[str(product.pk)], stock)
+
+                # The hot product's units are spread over its slots
+                self.assertEqual(self.order(product, stock).status_code, 201)
+                self.assertEqual(self.order(product, 1).status_code, 400)
+                self.assertEqual(current_stock([product.pk])[str(product.pk)], 0)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ProductPageTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Repeated prices and names, so pages split runs of equal sort keys
+        Product.objects.bulk_create([
+            Product(ProductName=f'Product {number % 4}', ProductPrice=number % 3, ProductQuantity=1, ProductImage='')
+            for number in range(23)
+        ])
+        cls.customer = create_user('customer')
+
+    def walk(self, ordering):
+        seen, cursor = [], None
+        while True:
+            params = {'ordering': ordering, 'limit': 5, 'fields': 'id'}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get(reverse('ProductDetails'), params, headers=bearer(self.customer)).json()
+            self.assertEqual(body['Status'], 6000, body)
+            seen.extend(product['id'] for product in body['data'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                return seen
+
+    def test_cursors_visit_every_product_once_in_order(self):
+        for ordering in ('name', 'price_asc', 'price_desc'):
+            with self.subTest(ordering):
+                everything = self.client.get(
+                    reverse('ProductDetails'), {'ordering': ordering, 'fields': 'id'}, headers=bearer(self.customer)
+                ).json()['data']
+                self.assertEqual(self.walk(ordering), [product['id'] for product in everything])
+                self.assertEqual(len(everything), 23)
+
+    def test_invalid_cursor_is_rejected(self):
+        body = self.client.get(reverse('ProductDetails'), {'cursor': 'nonsense', 'limit': 5}).json()
+        self.assertEqual(body['Status'], 6001)
+
+
+class CatalogImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(products=30, categories=3, users=2, reviews=0, orders=0, rebuild=False)
+        cls.hot = Product.objects.order_by('ProductID').first()
+        shard_stock(cls.hot, 4)
+
+    def snapshot(self):
+        return list(Product.objects.order_by('ProductID').values_list(
+            'ProductID', 'ProductName', 'ProductDescription', 'ProductPrice', 'category_id', 'is_trending'
+        ))
+
+    def test_reimporting_an_export_changes_nothing(self):
+        # Sold from the slots, so the product's ProductQuantity lags
+        with transaction.atomic():
+            reserve_stock(self.hot.pk, 2)
+        before = self.snapshot()
+        stock = current_stock(Product.objects.values_list('pk', flat=True))
+        for export_format in ('csv', 'jsonl'):
+            with self.subTest(export_format):
+                exported = ''.join(export_products(export_format)).encode()
+                summary = import_products(io.BytesIO(exported), export_format)
+                self.assertEqual((summary['created'], summary['updated'], summary['error_count']), (0, 30, 0))
+                self.assertEqual(self.snapshot(), before)
+                self.assertEqual(current_stock(Product.objects.values_list('pk', flat=True)), stock)
+
+
+@override_settings(TASKS_EAGER=False)
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = create_user('customer')
+        cls.owner = create_user('owner', role='OWNER')
+        cls.product = Product.objects.create(ProductName='Lamp', ProductPrice=12, ProductQuantity=100, ProductImage='')
+
+    def place(self, quantity):
+        data = {
+            'items': [{'product_id': str(self.product.pk), 'quantity': quantity}],
+            'full_name': 'Test Customer', 'address': '1 Main St', 'city': 'Springfield', 'zip_code': '12345',
+        }
+        response = self.client.post(reverse('place_order'), data, content_type='application/json', headers=bearer(self.customer))
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['order_id']
+
+    def run_tasks(self):
+        while (task := claim('tests')) is not None:
+            execute(task)
+
+    def assertTotals(self):
+        live = Order.objects.aggregate(
+            orders=Count('id'), revenue=Sum('total_amount'), cancelled=Count('id', filter=Q(status=CANCELLED)),
+        )
+        rolled = DailySalesRollup.objects.aggregate(
+            orders=Sum('orders'), revenue=Sum('revenue'), cancelled=Sum('cancelled_orders'),
+        )
+        totals = dashboard_totals()
+        self.assertEqual(
+            (totals['total_orders'], totals['total_revenue'], totals['cancelled_orders']),
+            (live['orders'], live['revenue'], live['cancelled']),
+        )
+        return live, rolled
+
+    def test_each_order_is_counted_once(self):
+        first = self.place(1)
+        self.place(2)
+        # Queued, not yet counted: the dashboard adds them live
+        self.assertTotals()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('update_status', args=[first]), {'status': CANCELLED},
+                content_type='application/json', headers=bearer(self.owner),
+            )
+        # A rebuild while the tasks are still queued, then the tasks
+        rebuild_rollups()
+        self.run_tasks()
+        live, rolled = self.assertTotals()
+        self.assertEqual(rolled, live)
+
+        self.place(3)
+        self.run_tasks()
+        rebuild_rollups()
+        live, rolled = self.assertTotals()
+        self.assertEqual(rolled, live)
+        self.assertEqual(rolled['orders'], 3)